@@ -1,24 +1,51 @@
 """
-A class that implements a simple AI opponent with random valid moves.
+A class that implements an AI opponent, which searches for its moves with the engine.
 """
 
 import random
+import threading
+from book import OpeningBook, WEIGHTED
+from engine import Engine
+from parallel import ParallelEngine
+from tablebase import Tablebases
 from utils import WHITE, BLACK, ROWS
 from pieces import *
 
 
 class AI:
     """
-    The implementation of the simple AI.
+    The implementation of the AI.
     """
 
-    def __init__(self):
+    def __init__(self, depth=4, time_limit=None, node_limit=None, workers=1, book=None, book_mode=WEIGHTED,
+                 tablebases=None):
         """
         Class constructor
         Assigns a random player color to the AI
+
+        :param depth: the maximum depth the engine searches to, in plies, or None to only stop on a budget
+        :param time_limit: the time the engine can think for each move, in milliseconds, or None
+        :param node_limit: the number of nodes the engine can search for each move, or None
+        :param workers: the number of processes the engine searches with, or None for one per core
+        :param book: the path of an opening book to play from while the game is in it, or None
+        :param book_mode: WEIGHTED to pick the book moves in proportion to their weights, or BEST for the heaviest
+        :param tablebases: the directory of the endgame tables the engine looks the endings up in, or None
         """
 
         self.color = random.randint(0, 1)
+        tablebases = Tablebases(tablebases) if tablebases is not None else None
+        if workers == 1:
+            self.engine = Engine(depth, time_limit=time_limit, node_limit=node_limit, tablebases=tablebases)
+        else:
+            self.engine = ParallelEngine(workers, depth, time_limit=time_limit, node_limit=node_limit,
+                                         tablebases=tablebases)
+        self.book = OpeningBook(book) if book is not None else None
+        self.book_mode = book_mode
+
+        # the background search, the event that cancels it and the move it found
+        self.thread = None
+        self.stop_event = None
+        self.ready_move = None
 
     def is_turn(self, board):
         """
@@ -34,45 +61,107 @@ class AI:
 
         return False
 
-    @staticmethod
-    def get_random_valid_move(piece):
+    def book_move(self, board):
         """
-        A static method that returns a random valid move
+        Looks up the position in the opening book.
+
+        :param board: the current board
+        :return: a book Move, or None if there is no book or the position is not in it
+        """
+
+        if self.book is None:
+            return None
 
-        :param piece: the piece to move
-        :return: a tuple that consists of a valid move, or None if there is no such tuple
+        return self.book.choose(board, self.book_mode)
+
+    def move(self, board):
+        """
+        A method that plays a book move, or searches for the best move once the game left the book, and makes it.
+
+        :param board: the current board
+        :return: None
         """
 
-        # gets and shuffles the possible moves of the piece
-        possible_moves = piece.move_set.copy()
-        random.shuffle(possible_moves)
+        move = self.book_move(board)
+        if move is None:
+            move, score = self.engine.search(board)
+        if move is not None:
+            board.move_piece(board.pieces[move.start[0]][move.start[1]], move.end, move.promotion)
 
-        # checks the moves and returns the first valid move of the given piece
-        for move in possible_moves:
-            new_position = (piece.position[0] + move[0], piece.position[1] + move[1])
-            if piece.validate_move(new_position):
-                return new_position
+    def is_thinking(self):
+        """
+        Checks if a background search was started and its move was not collected yet.
 
-        return None
+        :return: True if the AI is thinking, False otherwise
+        """
 
-    def move_random_piece(self, board):
+        return self.thread is not None
+
+    def start_thinking(self, board):
         """
-        A method that iterates through the pieces randomly and makes a valid move.
-        It calls the get_random_valid_move method.
+        A method that starts searching for a move in a background thread, on a copy of the board.
+        The caller keeps using the board and collects the move with poll.
 
         :param board: the current board
         :return: None
         """
 
-        # randomly going through the pieces
-        for row in random.sample(board.pieces, k=len(board.pieces)):
-            for piece in random.sample(row, k=len(row)):
+        self.stop_event = threading.Event()
+        self.ready_move = None
+        self.thread = threading.Thread(target=self.think, args=(board.copy(), self.stop_event), daemon=True)
+        self.thread.start()
+
+    def think(self, board, stop_event):
+        """
+        The body of the background search.
+
+        :param board: the copy of the board to search
+        :param stop_event: the event that cancels the search
+        :return: None
+        """
+
+        move = self.book_move(board)
+        if move is None:
+            move, score = self.engine.search(board, stop_event=stop_event)
+        if not stop_event.is_set():
+            self.ready_move = move
+
+    def poll(self):
+        """
+        A non-blocking check for the move of the background search.
+
+        :return: the Move found, or None if the search is still running
+        """
+
+        if self.thread is None or self.thread.is_alive():
+            return None
+
+        move = self.ready_move
+        self.thread = None
+        self.ready_move = None
+
+        return move
+
+    def cancel(self):
+        """
+        A method that stops the background search and waits for its thread to finish.
+
+        :return: None
+        """
+
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+            self.ready_move = None
 
-                # if a piece of the same color as the AI is found
-                if piece is not None and piece.color == self.color:
-                    move = self.get_random_valid_move(piece)
+    def close(self):
+        """
+        A method that stops the background search and the worker processes of a parallel engine.
+
+        :return: None
+        """
 
-                    # if it has a valid move, it moves it
-                    if move is not None:
-                        board.move_piece(piece, move)
-                        return
+        self.cancel()
+        if isinstance(self.engine, ParallelEngine):
+            self.engine.close()
@@ -0,0 +1,328 @@
+"""
+A bitboard backend for the chess board.
+
+Every square is a bit of a 64-bit integer, indexed as row * 8 + column, so a1 is bit 0 and h8 is bit 63.
+The attacks of the knights, kings and pawns are precomputed for every square, and the sliding pieces use
+precomputed ray masks that are cut at the first blocker, so occupancy and attack queries take constant time.
+"""
+
+from board import Board
+from move import Move
+from utils import *
+
+FULL = (1 << 64) - 1
+
+# the eight ray directions, the first four increase the square index and the last four decrease it
+NORTH, EAST, NORTH_EAST, NORTH_WEST, SOUTH, WEST, SOUTH_WEST, SOUTH_EAST = range(8)
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (-1, 1), (0, -1), (-1, 0), (-1, -1), (1, -1))
+ROOK_DIRECTIONS = (NORTH, EAST, SOUTH, WEST)
+BISHOP_DIRECTIONS = (NORTH_EAST, NORTH_WEST, SOUTH_WEST, SOUTH_EAST)
+
+
+def iterate_bits(bitboard):
+    """
+    Iterates through the set bits of a bitboard.
+
+    :param bitboard: the bitboard
+    :return: a generator of square indexes, from the lowest to the highest
+    """
+
+    while bitboard:
+        bit = bitboard & -bitboard
+        yield bit.bit_length() - 1
+        bitboard ^= bit
+
+
+def _offset_table(offsets):
+    """
+    Builds the attack table of a piece that jumps by fixed offsets.
+
+    :param offsets: a tuple of (x, y) offsets
+    :return: a tuple of 64 bitboards
+    """
+
+    table = []
+    for square in range(64):
+        x, y = square_position(square)
+        attacks = 0
+        for dx, dy in offsets:
+            if 0 <= x + dx < 8 and 0 <= y + dy < 8:
+                attacks |= 1 << square_index((x + dx, y + dy))
+        table.append(attacks)
+
+    return tuple(table)
+
+
+def _ray_table(dx, dy):
+    """
+    Builds the table of the squares between each square and the edge of the board in a direction.
+
+    :param dx: the column step
+    :param dy: the row step
+    :return: a tuple of 64 bitboards
+    """
+
+    table = []
+    for square in range(64):
+        x, y = square_position(square)
+        ray = 0
+        x, y = x + dx, y + dy
+        while 0 <= x < 8 and 0 <= y < 8:
+            ray |= 1 << square_index((x, y))
+            x, y = x + dx, y + dy
+        table.append(ray)
+
+    return tuple(table)
+
+
+KNIGHT_ATTACKS = _offset_table(((-1, 2), (1, 2), (-2, 1), (2, 1), (-2, -1), (2, -1), (-1, -2), (1, -2)))
+KING_ATTACKS = _offset_table(DIRECTIONS)
+PAWN_ATTACKS = (_offset_table(((-1, -1), (1, -1))), _offset_table(((-1, 1), (1, 1))))
+RAYS = tuple(_ray_table(dx, dy) for dx, dy in DIRECTIONS)
+
+
+def ray_attacks(square, occupied, direction):
+    """
+    Computes the attacks of a slider along one ray, cut at the first blocker.
+
+    :param square: the index of the slider's square
+    :param occupied: the occupancy bitboard
+    :param direction: the index of the ray direction
+    :return: the bitboard of the attacked squares, including the blocker
+    """
+
+    rays = RAYS[direction]
+    attacks = rays[square]
+    blockers = attacks & occupied
+    if blockers:
+        # the closest blocker is the lowest bit on increasing rays and the highest bit on decreasing rays
+        if direction < SOUTH:
+            blocker = (blockers & -blockers).bit_length() - 1
+        else:
+            blocker = blockers.bit_length() - 1
+        attacks ^= rays[blocker]
+
+    return attacks
+
+
+def rook_attacks(square, occupied):
+    """
+    Computes the attacks of a rook.
+
+    :param square: the index of the rook's square
+    :param occupied: the occupancy bitboard
+    :return: the bitboard of the attacked squares
+    """
+
+    return (ray_attacks(square, occupied, NORTH) | ray_attacks(square, occupied, EAST) |
+            ray_attacks(square, occupied, SOUTH) | ray_attacks(square, occupied, WEST))
+
+
+def bishop_attacks(square, occupied):
+    """
+    Computes the attacks of a bishop.
+
+    :param square: the index of the bishop's square
+    :param occupied: the occupancy bitboard
+    :return: the bitboard of the attacked squares
+    """
+
+    return (ray_attacks(square, occupied, NORTH_EAST) | ray_attacks(square, occupied, NORTH_WEST) |
+            ray_attacks(square, occupied, SOUTH_WEST) | ray_attacks(square, occupied, SOUTH_EAST))
+
+
+class BitboardBoard(Board):
+    """
+    A board that keeps a bitboard per piece type and color next to the pieces matrix.
+    It has the same interface as Board, so it can be used by the interface, while the search and analysis
+    code can use the bitboards for occupancy and attack queries.
+    """
+
+    def __init__(self, fen=None, data=None):
+        """
+        Class constructor
+        Extends the Board constructor. It builds the bitboards from the initial pieces matrix.
+
+        :param fen: a position in Forsyth-Edwards Notation, or None
+        :param data: a position packed by the encode method, or None
+        """
+
+        # bitboards[color][piece_type], occupancy[color] and the occupancy of both colors
+        self.bitboards = [[0] * 6 for i in range(2)]
+        self.occupancy = [0, 0]
+        self.occupied = 0
+
+        super().__init__(fen, data)
+
+        for row in self.pieces:
+            for piece in row:
+                if piece is not None:
+                    self._set_bit(piece, square_index(piece.position))
+
+    def copy(self):
+        """
+        Extends the Board method. Copies the bitboards, which would otherwise be shared.
+
+        :return: the new BitboardBoard
+        """
+
+        board = super().copy()
+        board.bitboards = [list(bitboards) for bitboards in self.bitboards]
+        board.occupancy = list(self.occupancy)
+
+        return board
+
+    def _set_bit(self, piece, square):
+        """
+        Toggles the bit of a square in the bitboards of a piece.
+
+        :param piece: the piece
+        :param square: the index of the square
+        :return: None
+        """
+
+        bit = 1 << square
+        self.bitboards[piece.color][piece.piece_type] ^= bit
+        self.occupancy[piece.color] ^= bit
+        self.occupied ^= bit
+
+    def _put_piece(self, piece, position):
+        """
+        Extends the Board method. Sets the bit of the square.
+
+        :param piece: the piece to place
+        :param position: the position to place it on
+        :return: None
+        """
+
+        super()._put_piece(piece, position)
+        self._set_bit(piece, square_index(position))
+
+    def _remove_piece(self, position):
+        """
+        Extends the Board method. Clears the bit of the square.
+
+        :param position: the position of the piece
+        :return: the removed piece
+        """
+
+        piece = super()._remove_piece(position)
+        self._set_bit(piece, square_index(position))
+
+        return piece
+
+    def is_occupied(self, position):
+        """
+        Checks if a square is occupied.
+
+        :param position: a tuple consisting of the column and row
+        :return: True if there is a piece on that square, False otherwise
+        """
+
+        return self.occupied >> square_index(position) & 1 == 1
+
+    def attackers(self, square, color):
+        """
+        Computes the pieces of a color that attack a square.
+        It looks from the square outwards with the attack pattern of every piece type.
+
+        :param square: the index of the square
+        :param color: the color of the attacking side
+        :return: the bitboard of the attacking pieces
+        """
+
+        pieces = self.bitboards[color]
+        occupied = self.occupied
+        diagonal = pieces[BISHOP] | pieces[QUEEN]
+        straight = pieces[ROOK] | pieces[QUEEN]
+
+        return ((PAWN_ATTACKS[not color][square] & pieces[PAWN]) |
+                (KNIGHT_ATTACKS[square] & pieces[KNIGHT]) |
+                (KING_ATTACKS[square] & pieces[KING]) |
+                (bishop_attacks(square, occupied) & diagonal if diagonal else 0) |
+                (rook_attacks(square, occupied) & straight if straight else 0))
+
+    def attacks(self, color):
+        """
+        Computes every square attacked by a side.
+
+        :param color: the color of the attacking side
+        :return: the bitboard of the attacked squares
+        """
+
+        pieces = self.bitboards[color]
+        occupied = self.occupied
+        attacks = 0
+
+        for square in iterate_bits(pieces[PAWN]):
+            attacks |= PAWN_ATTACKS[color][square]
+        for square in iterate_bits(pieces[KNIGHT]):
+            attacks |= KNIGHT_ATTACKS[square]
+        for square in iterate_bits(pieces[KING]):
+            attacks |= KING_ATTACKS[square]
+        for square in iterate_bits(pieces[BISHOP] | pieces[QUEEN]):
+            attacks |= bishop_attacks(square, occupied)
+        for square in iterate_bits(pieces[ROOK] | pieces[QUEEN]):
+            attacks |= rook_attacks(square, occupied)
+
+        return attacks
+
+    def generate_moves(self, color, captures=None):
+        """
+        Overrides the Board method. Generates the pseudo-legal moves of a side from the bitboards.
+        Only the squares of the requested kind of moves are kept as targets, so the others are never produced.
+
+        :param color: the color of the side to generate the moves for
+        :param captures: True for the captures and promotions only, False for the other moves only, None for all
+        :return: a list of Move objects
+        """
+
+        moves = []
+        pieces = self.bitboards[color]
+        occupied = self.occupied
+        enemies = self.occupancy[not color]
+        if captures is None:
+            targets = ~self.occupancy[color] & FULL
+        elif captures:
+            targets = enemies
+        else:
+            targets = ~occupied & FULL
+
+        # pawn pushes, double pushes from the starting row and captures, which promote on the last row
+        if color == WHITE:
+            step, start_row = 8, 1
+        else:
+            step, start_row = -8, 6
+        for square in iterate_bits(pieces[PAWN]):
+            start = square_position(square)
+            forward = square + step
+            if 0 <= forward < 64 and not occupied >> forward & 1:
+                # a push to the last row is a promotion, which is searched with the captures
+                if captures is None or captures == (forward >> 3 == 7 or forward >> 3 == 0):
+                    self.append_pawn_move(moves, start, square_position(forward))
+                if square >> 3 == start_row and not occupied >> (forward + step) & 1 and not captures:
+                    moves.append(Move(start, square_position(forward + step)))
+            if captures is not False:
+                for end in iterate_bits(PAWN_ATTACKS[color][square] & enemies):
+                    self.append_pawn_move(moves, start, square_position(end))
+
+        # the other pieces move to any attacked square that is not occupied by their own side
+        for piece_type in (KNIGHT, BISHOP, ROOK, QUEEN, KING):
+            for square in iterate_bits(pieces[piece_type]):
+                if piece_type == KNIGHT:
+                    attacks = KNIGHT_ATTACKS[square]
+                elif piece_type == BISHOP:
+                    attacks = bishop_attacks(square, occupied)
+                elif piece_type == ROOK:
+                    attacks = rook_attacks(square, occupied)
+                elif piece_type == QUEEN:
+                    attacks = bishop_attacks(square, occupied) | rook_attacks(square, occupied)
+                else:
+                    attacks = KING_ATTACKS[square]
+
+                start = square_position(square)
+                for end in iterate_bits(attacks & targets):
+                    moves.append(Move(start, square_position(end)))
+
+        self.append_special_moves(moves, color, captures)
+        return moves
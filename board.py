@@ -1,8 +1,90 @@
 """
 A class that models the chess board.
+It only holds the rules and the position, the drawing is done by the renderer, so it can be used without pygame.
 """
 
+import copy
+import struct
+from collections import namedtuple
+from move import Move
 from pieces import *
+from evaluation import MIDDLEGAME_TABLES, ENDGAME_TABLES, PHASE_WEIGHTS, compute_totals
+from zobrist import PIECE_KEYS, BLACK_TO_MOVE_KEY, CASTLING_KEYS, EN_PASSANT_KEYS, compute_hash
+
+# the state needed to take back a move, which can't be recomputed from the position after the move
+UndoRecord = namedtuple('UndoRecord', ['move', 'piece', 'captured', 'turn', 'castling_rights', 'en_passant',
+                                       'game_ended', 'hash', 'halfmove_clock'])
+
+STARTING_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+CASTLING_SYMBOLS = ((WHITE_KINGSIDE, 'K'), (WHITE_QUEENSIDE, 'Q'), (BLACK_KINGSIDE, 'k'), (BLACK_QUEENSIDE, 'q'))
+
+# the packed position: the occupied squares, a 4-bit code for each of their pieces, the turn and castling rights,
+# the en passant square, the halfmove clock and the fullmove number
+POSITION_STRUCT = struct.Struct('<Q16sBBBH')
+NO_EN_PASSANT = 0xFF
+
+# the pieces a pawn can be promoted to, the most valuable first
+PROMOTION_TYPES = (QUEEN, ROOK, BISHOP, KNIGHT)
+
+# the castling right, the rook's column and the squares between the king and the rook, for every castling
+CASTLING_MOVES = {
+    WHITE: ((WHITE_KINGSIDE, 7, (5, 6)), (WHITE_QUEENSIDE, 0, (1, 2, 3))),
+    BLACK: ((BLACK_KINGSIDE, 7, (5, 6)), (BLACK_QUEENSIDE, 0, (1, 2, 3))),
+}
+# the rook's start and end column, keyed by the column the king castles to
+CASTLING_ROOKS = {6: (7, 5), 2: (0, 3)}
+
+DRAW = '1/2-1/2'
+
+
+def _target_table(offsets):
+    """
+    Computes the squares a piece attacks with fixed offsets from every square.
+
+    :param offsets: the (column, row) offsets of the piece
+    :return: a list of tuples of square indices, indexed by square
+    """
+
+    table = []
+    for square in range(64):
+        x, y = square & 7, square >> 3
+        table.append(tuple((y + dy) * 8 + x + dx for dx, dy in offsets if 0 <= x + dx < 8 and 0 <= y + dy < 8))
+
+    return table
+
+
+def _ray_table(dx, dy):
+    """
+    Computes the squares a ray goes through from every square, nearest first.
+
+    :param dx: the column step of the ray
+    :param dy: the row step of the ray
+    :return: a list of tuples of square indices, indexed by square
+    """
+
+    table = []
+    for square in range(64):
+        x, y = (square & 7) + dx, (square >> 3) + dy
+        ray = []
+        while 0 <= x < 8 and 0 <= y < 8:
+            ray.append(y * 8 + x)
+            x += dx
+            y += dy
+        table.append(tuple(ray))
+
+    return table
+
+
+# the squares attacked from every square by the pieces that don't slide, the pawns indexed by color
+KNIGHT_TARGETS = _target_table(Knight.directions)
+KING_TARGETS = _target_table(King.directions)
+PAWN_TARGETS = (_target_table(((-1, -1), (1, -1))), _target_table(((-1, 1), (1, 1))))
+
+# the straight directions first, then the diagonal ones, the squares of every ray and the opposite of every direction
+RAY_DIRECTIONS = Rook.directions + Bishop.directions
+RAYS = tuple(_ray_table(dx, dy) for dx, dy in RAY_DIRECTIONS)
+OPPOSITE_DIRECTIONS = tuple(RAY_DIRECTIONS.index((-dx, -dy)) for dx, dy in RAY_DIRECTIONS)
+SLIDING_DIRECTIONS = {BISHOP: range(4, 8), ROOK: range(4), QUEEN: range(8)}
 
 
 class Board:
@@ -10,19 +92,44 @@ class Board:
     The implementation of a chess board.
     """
 
-    def __init__(self):
+    def __init__(self, fen=None, data=None):
         """
         Class constructor
-        It initializes the board with the pieces hardcoded in the correct position.
-        Sets the current turn to white's turn.
+        It initializes the board with the pieces hardcoded in the correct position, unless a FEN string or a
+        packed position is given. Sets the current turn to white's turn.
+
+        :param fen: a position in Forsyth-Edwards Notation, or None
+        :param data: a position packed by the encode method, or None
         """
 
         self.turn = WHITE
         self.selected = None
         self.move_attempt = None
         self.game_ended = False
+        self.result = None
+        self.end_reason = None
+        self.castling_rights = ALL_CASTLING_RIGHTS
+        self.en_passant = None
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+        self.move_stack = []
         self.pieces = [[None] * 8 for i in range(8)]
 
+        # the Zobrist keys of the positions reached before the first move on the move stack, in order
+        self.root_hashes = []
+
+        if fen is not None or data is not None:
+            if fen is not None:
+                self.set_fen(fen)
+            else:
+                self.unpack(data)
+            self.hash = compute_hash(self)
+            self.middlegame_score, self.endgame_score, self.phase = compute_totals(self)
+            self.king_positions = self.find_kings()
+            self.attack_counts = self.compute_attack_counts()
+            self.piece_count = self.count_pieces()
+            return
+
         for i in range(8):
             self.pieces[i][1] = Pawn(WHITE, (i, 1), self.pieces)
             self.pieces[i][6] = Pawn(BLACK, (i, 6), self.pieces)
@@ -53,44 +160,962 @@ class Board:
         self.pieces[4][0] = King(WHITE, (4, 0), self.pieces)
         self.pieces[4][7] = King(BLACK, (4, 7), self.pieces)
 
+        # the Zobrist key of the position, which is updated incrementally by every move
+        self.hash = compute_hash(self)
+        # the sums of the evaluation, which are updated incrementally like the key
+        self.middlegame_score, self.endgame_score, self.phase = compute_totals(self)
+        self.king_positions = self.find_kings()
+        self.attack_counts = self.compute_attack_counts()
+        # the number of pieces on the board, so the endgame tables are only looked up when they can apply
+        self.piece_count = self.count_pieces()
+
+    def count_pieces(self):
+        """
+        Counts the pieces on the board by scanning it.
+
+        :return: the number of pieces of both sides
+        """
+
+        return sum(piece is not None for column in self.pieces for piece in column)
+
+    def find_kings(self):
+        """
+        A method that looks for the king of each side. They are tracked by every move afterwards.
+
+        :return: a list of the king positions, indexed by color, None for a missing king
+        """
+
+        king_positions = [None, None]
+        for row in self.pieces:
+            for piece in row:
+                if piece is not None and piece.piece_type == KING:
+                    king_positions[piece.color] = piece.position
+
+        return king_positions
+
+    def compute_attack_counts(self):
+        """
+        A method that counts, for every square, the pieces of each side that attack it.
+        The counts are kept up to date by every move afterwards, so checking if a square is attacked is a lookup.
+
+        :return: a list of the 64 attack counts of each side, indexed by color
+        """
+
+        self.attack_counts = [[0] * 64, [0] * 64]
+        for row in self.pieces:
+            for piece in row:
+                if piece is not None:
+                    self._update_attacks(piece, piece.position[1] * 8 + piece.position[0], 1)
+
+        return self.attack_counts
+
+    def _update_attacks(self, piece, square, delta):
+        """
+        Adds or removes the attacks of a piece to the attack counts of its side.
+        The rays of a sliding piece stop at the first piece they reach, which they attack.
+
+        :param piece: the piece
+        :param square: the index of its square
+        :param delta: 1 to add the attacks, -1 to remove them
+        :return: None
+        """
+
+        counts = self.attack_counts[piece.color]
+        piece_type = piece.piece_type
+
+        if piece_type == PAWN:
+            targets = PAWN_TARGETS[piece.color][square]
+        elif piece_type == KNIGHT:
+            targets = KNIGHT_TARGETS[square]
+        elif piece_type == KING:
+            targets = KING_TARGETS[square]
+        else:
+            pieces = self.pieces
+            for direction in SLIDING_DIRECTIONS[piece_type]:
+                for target in RAYS[direction][square]:
+                    counts[target] += delta
+                    if pieces[target & 7][target >> 3] is not None:
+                        break
+            return
+
+        for target in targets:
+            counts[target] += delta
+
+    def _update_rays_through(self, square, delta):
+        """
+        Extends or cuts the rays of the sliding pieces that attack a square, beyond it.
+        It is called when the square is empty, after a piece left it or before a piece is placed on it.
+
+        :param square: the index of the square
+        :param delta: 1 to extend the rays, -1 to cut them
+        :return: None
+        """
+
+        pieces = self.pieces
+        for direction in range(8):
+            # only the first piece in every direction can attack the square along it
+            for target in RAYS[direction][square]:
+                piece = pieces[target & 7][target >> 3]
+                if piece is None:
+                    continue
+
+                piece_type = piece.piece_type
+                if piece_type == QUEEN or piece_type == (ROOK if direction < 4 else BISHOP):
+                    counts = self.attack_counts[piece.color]
+                    for beyond in RAYS[OPPOSITE_DIRECTIONS[direction]][square]:
+                        counts[beyond] += delta
+                        if pieces[beyond & 7][beyond >> 3] is not None:
+                            break
+                break
+
+    def perft(self, depth):
+        """
+        A method that counts the leaf nodes of the move tree to a given depth, which checks the move generation
+        against known counts and measures its speed. The moves of the last ply are counted without being made.
+
+        :param depth: the depth of the tree, in plies
+        :return: the number of leaf nodes
+        """
+
+        if depth == 0:
+            return 1
+
+        moves = self.legal_moves()
+        if depth == 1:
+            return len(moves)
+
+        nodes = 0
+        for move in moves:
+            self.push(move)
+            nodes += self.perft(depth - 1)
+            self.pop()
+
+        return nodes
+
+    def divide(self, depth):
+        """
+        A method that runs perft for every move of the position separately, to narrow down a wrong count.
+
+        :param depth: the depth of the tree, in plies, including the move itself
+        :return: a dictionary of the number of leaf nodes for every Move
+        """
+
+        counts = {}
+        for move in self.legal_moves():
+            self.push(move)
+            counts[move] = self.perft(depth - 1)
+            self.pop()
+
+        return counts
+
+    @classmethod
+    def from_fen(cls, fen):
+        """
+        A class method that creates a board from a FEN string.
+
+        :param fen: a position in Forsyth-Edwards Notation
+        :return: the new board
+        """
+
+        return cls(fen=fen)
+
+    def set_fen(self, fen):
+        """
+        A method that places the pieces of a FEN string on an empty board.
+
+        :param fen: a position in Forsyth-Edwards Notation
+        :return: None
+        """
+
+        fields = fen.split()
+        if len(fields) == 4:
+            fields += ['0', '1']
+        if len(fields) != 6:
+            raise ValueError(f'Invalid FEN: {fen}')
+        placement, turn, castling_rights, en_passant, halfmove_clock, fullmove_number = fields
+
+        rows = placement.split('/')
+        if len(rows) != 8:
+            raise ValueError(f'Invalid FEN placement: {placement}')
+
+        # the rows are listed from the eighth to the first
+        for y, row in zip(range(7, -1, -1), rows):
+            x = 0
+            for symbol in row:
+                if symbol.isdigit():
+                    x += int(symbol)
+                elif symbol.lower() in PIECE_SYMBOLS and x < 8:
+                    color = WHITE if symbol.isupper() else BLACK
+                    piece_class = PIECE_CLASSES[PIECE_SYMBOLS.index(symbol.lower())]
+                    self.pieces[x][y] = piece_class(color, (x, y), self.pieces)
+                    x += 1
+                else:
+                    raise ValueError(f'Invalid FEN placement: {placement}')
+            if x != 8:
+                raise ValueError(f'Invalid FEN placement: {placement}')
+
+        # the search and the check detection rely on both kings being on the board, once
+        if placement.count('K') != 1 or placement.count('k') != 1:
+            raise ValueError(f'Invalid FEN placement, each side needs exactly one king: {placement}')
+
+        if turn not in ('w', 'b'):
+            raise ValueError(f'Invalid FEN turn: {turn}')
+        self.turn = WHITE if turn == 'w' else BLACK
+
+        if castling_rights != '-' and (len(set(castling_rights)) != len(castling_rights) or
+                                       any(symbol not in 'KQkq' for symbol in castling_rights)):
+            raise ValueError(f'Invalid FEN castling rights: {castling_rights}')
+        self.castling_rights = 0
+        for right, symbol in CASTLING_SYMBOLS:
+            if symbol in castling_rights:
+                self.castling_rights |= right
+
+        self.en_passant = None if en_passant == '-' else parse_square(en_passant)
+        if self.en_passant is not None:
+            # the square a pawn skipped is empty, on the third row after a white move and on the sixth after a black
+            # one, and the pawn that skipped it stands right in front of it
+            x, y = self.en_passant
+            front = 3 if self.turn == BLACK else 4
+            pawn = self.pieces[x][front]
+            if y != (5 if self.turn == WHITE else 2) or self.pieces[x][y] is not None or pawn is None or \
+                    pawn.piece_type != PAWN or pawn.color == self.turn:
+                raise ValueError(f'Invalid FEN en passant square: {en_passant}')
+
+            # like push, only keeps the square if an enemy pawn can capture, so the Zobrist key of the position is
+            # the same whichever way it is reached
+            neighbours = [self.pieces[column][front] for column in (x - 1, x + 1) if 0 <= column < 8]
+            if not any(neighbour is not None and neighbour.piece_type == PAWN and neighbour.color == self.turn
+                       for neighbour in neighbours):
+                self.en_passant = None
+        self.halfmove_clock = int(halfmove_clock)
+        self.fullmove_number = int(fullmove_number)
+
+    def to_fen(self):
+        """
+        A method that writes the position as a FEN string.
+
+        :return: the position in Forsyth-Edwards Notation
+        """
+
+        rows = []
+        for y in range(7, -1, -1):
+            row = ''
+            empty = 0
+            for x in range(8):
+                piece = self.pieces[x][y]
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                symbol = PIECE_SYMBOLS[piece.piece_type]
+                row += symbol.upper() if piece.color == WHITE else symbol
+            if empty:
+                row += str(empty)
+            rows.append(row)
+
+        castling_rights = ''.join(symbol for right, symbol in CASTLING_SYMBOLS if self.castling_rights & right) or '-'
+        en_passant = '-' if self.en_passant is None else square_name(self.en_passant)
+
+        return f"{'/'.join(rows)} {'w' if self.turn == WHITE else 'b'} {castling_rights} {en_passant} " \
+               f"{self.halfmove_clock} {self.fullmove_number}"
+
+    def encode(self):
+        """
+        A method that packs the position into 29 bytes, which are cheap to store or send to another process.
+        The occupied squares are a bitboard, followed by a 4-bit code for the piece of each of them, in the order
+        of the squares. A position has at most 32 pieces, so their codes fit in 16 bytes.
+
+        :return: the packed position, as bytes
+        """
+
+        occupied = 0
+        codes = 0
+        count = 0
+        for square in range(64):
+            piece = self.pieces[square & 7][square >> 3]
+            if piece is not None:
+                occupied |= 1 << square
+                codes |= (piece.color * 6 + piece.piece_type) << (4 * count)
+                count += 1
+
+        if count > 32:
+            raise ValueError('A position with more than 32 pieces can not be packed')
+
+        flags = (1 if self.turn == WHITE else 0) | self.castling_rights << 1
+        en_passant = NO_EN_PASSANT if self.en_passant is None else square_index(self.en_passant)
+
+        return POSITION_STRUCT.pack(occupied, codes.to_bytes(16, 'little'), flags, en_passant,
+                                    min(self.halfmove_clock, 255), self.fullmove_number)
+
+    @classmethod
+    def decode(cls, data):
+        """
+        A class method that creates a board from a packed position.
+
+        :param data: a position packed by the encode method
+        :return: the new board
+        """
+
+        return cls(data=data)
+
+    def unpack(self, data):
+        """
+        A method that places the pieces of a packed position on an empty board.
+
+        :param data: a position packed by the encode method
+        :return: None
+        """
+
+        occupied, codes, flags, en_passant, self.halfmove_clock, self.fullmove_number = POSITION_STRUCT.unpack(data)
+        codes = int.from_bytes(codes, 'little')
+
+        while occupied:
+            bit = occupied & -occupied
+            position = square_position(bit.bit_length() - 1)
+            occupied ^= bit
+
+            code = codes & 15
+            codes >>= 4
+            color, piece_type = divmod(code, 6)
+            self.pieces[position[0]][position[1]] = PIECE_CLASSES[piece_type](color, position, self.pieces)
+
+        self.turn = WHITE if flags & 1 else BLACK
+        self.castling_rights = flags >> 1 & ALL_CASTLING_RIGHTS
+        self.en_passant = None if en_passant == NO_EN_PASSANT else square_position(en_passant)
+
+    def copy(self):
+        """
+        A method that copies the position, so it can be searched by another thread without affecting this board.
+        The moves made before are not copied and can't be taken back on the copy, but the positions they went
+        through are remembered, so repetitions are still recognised.
+
+        :return: the new Board
+        """
+
+        board = copy.copy(self)
+        board.pieces = [[None] * 8 for i in range(8)]
+        board.move_stack = []
+        board.root_hashes = self.root_hashes + [record.hash for record in self.move_stack]
+        board.king_positions = list(self.king_positions)
+        board.attack_counts = [list(counts) for counts in self.attack_counts]
+        board.selected = None
+        board.move_attempt = None
+
+        for row in self.pieces:
+            for piece in row:
+                if piece is not None:
+                    board.pieces[piece.position[0]][piece.position[1]] = \
+                        type(piece)(piece.color, piece.position, board.pieces)
+
+        return board
+
+    def generate_moves(self, color, captures=None):
+        """
+        A method that generates the pseudo-legal moves of a side in one pass.
+        Each piece walks its rays outward and stops at the first blocker, so the cost is proportional
+        to the number of moves produced. Castling is generated if the squares between the king and the rook are
+        empty, whether or not the king passes through check.
+
+        :param color: the color of the side to generate the moves for
+        :param captures: True for the captures and promotions only, False for the other moves only, None for all
+        :return: a list of Move objects
+        """
+
+        moves = []
+        pieces = self.pieces
+        for row in pieces:
+            for piece in row:
+                if piece is not None and piece.color == color:
+                    start = piece.position
+                    if piece.piece_type == PAWN:
+                        # the pawns only move diagonally to capture
+                        for end in piece.get_moves():
+                            if captures is None or captures == (end[0] != start[0] or end[1] == 7 or end[1] == 0):
+                                self.append_pawn_move(moves, start, end)
+                    elif captures is None:
+                        moves.extend(Move(start, end) for end in piece.get_moves())
+                    else:
+                        moves.extend(Move(start, end) for end in piece.get_moves()
+                                     if captures == (pieces[end[0]][end[1]] is not None))
+
+        self.append_special_moves(moves, color, captures)
+        return moves
+
     @staticmethod
-    def draw_board(window):
+    def append_pawn_move(moves, start, end):
+        """
+        A static method that adds a pawn move to a list, as one move for every promotion if it reaches the last row.
+
+        :param moves: the list of Move objects
+        :param start: the position of the pawn
+        :param end: the position it moves to
+        :return: None
+        """
+
+        if end[1] == 7 or end[1] == 0:
+            moves.extend(Move(start, end, promotion) for promotion in PROMOTION_TYPES)
+        else:
+            moves.append(Move(start, end))
+
+    def append_special_moves(self, moves, color, captures=None):
+        """
+        A method that adds the en passant captures and the castlings of a side to a list of moves.
+
+        :param moves: the list of Move objects
+        :param color: the color of the side to generate the moves for
+        :param captures: True for the en passant captures only, False for the castlings only, None for both
+        :return: None
+        """
+
+        pieces = self.pieces
+
+        # the pawns next to a pawn that just moved two squares can capture it on the square it skipped
+        if self.en_passant is not None and color == self.turn and captures is not False:
+            x, y = self.en_passant
+            row = y - 1 if color == WHITE else y + 1
+            for column in (x - 1, x + 1):
+                if 0 <= column < 8:
+                    piece = pieces[column][row]
+                    if piece is not None and piece.color == color and piece.piece_type == PAWN:
+                        moves.append(Move((column, row), self.en_passant))
+
+        if not self.castling_rights or captures:
+            return
+        row = 0 if color == WHITE else 7
+        king = pieces[4][row]
+        if king is None or king.piece_type != KING or king.color != color:
+            return
+        for right, column, path in CASTLING_MOVES[color]:
+            rook = pieces[column][row]
+            if self.castling_rights & right and rook is not None and rook.piece_type == ROOK and \
+                    rook.color == color and all(pieces[x][row] is None for x in path):
+                moves.append(Move((4, row), (6 if column == 7 else 2, row)))
+
+    def is_attacked(self, position, color, ignore=None):
+        """
+        Checks if a square is attacked by a side, by looking up its attack count.
+
+        :param position: a tuple consisting of the column and row
+        :param color: the color of the attacking side
+        :param ignore: the position of a piece the sliding pieces can see through, such as a king moving away
+         from them, or None
+        :return: True if the square is attacked, False otherwise
+        """
+
+        counts = self.attack_counts[color]
+
+        # a piece can only hide a square from a sliding piece that attacks it
+        if ignore is not None and counts[ignore[1] * 8 + ignore[0]]:
+            return self.scan_attacks(position, color, ignore)
+
+        return counts[position[1] * 8 + position[0]] > 0
+
+    def scan_attacks(self, position, color, ignore=None):
+        """
+        Checks if a square is attacked by a side without the attack counts.
+        It looks from the square outwards with the attack pattern of every piece type.
+
+        :param position: a tuple consisting of the column and row
+        :param color: the color of the attacking side
+        :param ignore: the position of a piece the sliding pieces can see through, or None
+        :return: True if the square is attacked, False otherwise
+        """
+
+        pieces = self.pieces
+        x, y = position
+
+        # a pawn attacks the square from the row behind it
+        row = y - 1 if color == WHITE else y + 1
+        if 0 <= row < 8:
+            for column in (x - 1, x + 1):
+                if 0 <= column < 8:
+                    piece = pieces[column][row]
+                    if piece is not None and piece.color == color and piece.piece_type == PAWN:
+                        return True
+
+        for offsets, piece_type in ((Knight.directions, KNIGHT), (King.directions, KING)):
+            for dx, dy in offsets:
+                new_x, new_y = x + dx, y + dy
+                if 0 <= new_x < 8 and 0 <= new_y < 8:
+                    piece = pieces[new_x][new_y]
+                    if piece is not None and piece.color == color and piece.piece_type == piece_type:
+                        return True
+
+        # the first piece on every ray decides if the square is attacked along it
+        for directions, piece_type in ((Rook.directions, ROOK), (Bishop.directions, BISHOP)):
+            for dx, dy in directions:
+                new_x, new_y = x + dx, y + dy
+                while 0 <= new_x < 8 and 0 <= new_y < 8:
+                    piece = pieces[new_x][new_y]
+                    if piece is not None and (new_x, new_y) != ignore:
+                        if piece.color == color and (piece.piece_type == piece_type or piece.piece_type == QUEEN):
+                            return True
+                        break
+                    new_x += dx
+                    new_y += dy
+
+        return False
+
+    def is_check(self):
+        """
+        Checks if the side to move is in check.
+
+        :return: True if its king is attacked, False otherwise
+        """
+
+        king = self.king_positions[self.turn]
+        return king is not None and self.attack_counts[not self.turn][king[1] * 8 + king[0]] > 0
+
+    def pins_and_checks(self):
+        """
+        A method that finds what restricts the moves of the side to move, once per position.
+        The check mask holds the squares that block or capture the only checking piece. The pin of a piece holds
+        the squares it can move to without uncovering its king, which are on the line between the king and the
+        piece pinning it.
+
+        :return: a tuple consisting of the number of checking pieces, the check mask, or None if there is no check,
+         and a dictionary of the pins, keyed by the position of the pinned piece
+        """
+
+        color = self.turn
+        pieces = self.pieces
+        x, y = self.king_positions[color]
+        checkers = self.attack_counts[not color][y * 8 + x]
+        check_mask = None
+        pins = {}
+
+        # looks along every ray for an enemy sliding piece, with at most one piece of the king's side in between
+        for directions, piece_type in ((Rook.directions, ROOK), (Bishop.directions, BISHOP)):
+            for dx, dy in directions:
+                ray = []
+                pinned = None
+                new_x, new_y = x + dx, y + dy
+                while 0 <= new_x < 8 and 0 <= new_y < 8:
+                    ray.append((new_x, new_y))
+                    piece = pieces[new_x][new_y]
+                    if piece is not None:
+                        if piece.color == color:
+                            if pinned is not None:
+                                break
+                            pinned = (new_x, new_y)
+                        else:
+                            if piece.piece_type == piece_type or piece.piece_type == QUEEN:
+                                if pinned is None:
+                                    check_mask = set(ray)
+                                else:
+                                    pins[pinned] = set(ray)
+                            break
+                    new_x += dx
+                    new_y += dy
+
+        # the attack count of the king's square is the number of checking pieces, a knight or pawn giving check
+        # can only be captured
+        if checkers == 1 and check_mask is None:
+            row = y + 1 if color == WHITE else y - 1
+            pawn_squares = ((x - 1, row), (x + 1, row))
+            for offsets, piece_type in ((Knight.directions, KNIGHT), (pawn_squares, PAWN)):
+                for offset in offsets:
+                    new_x, new_y = (x + offset[0], y + offset[1]) if piece_type == KNIGHT else offset
+                    if 0 <= new_x < 8 and 0 <= new_y < 8:
+                        piece = pieces[new_x][new_y]
+                        if piece is not None and piece.color != color and piece.piece_type == piece_type:
+                            check_mask = {(new_x, new_y)}
+
+        return checkers, check_mask, pins
+
+    def legal_moves(self, captures=None, restrictions=None):
+        """
+        A method that generates the legal moves of the side to move.
+
+        :param captures: True for the captures and promotions only, False for the other moves only, None for all
+        :param restrictions: the result of pins_and_checks for the position, or None to compute it
+        :return: a list of Move objects
+        """
+
+        return self.filter_legal(self.generate_moves(self.turn, captures), restrictions)
+
+    def is_legal(self, move, restrictions=None):
+        """
+        Checks if a move is legal in the position, such as a move remembered from another position.
+        Only the moves of the piece it starts from are generated.
+
+        :param move: the Move
+        :param restrictions: the result of pins_and_checks for the position, or None to compute it
+        :return: True if the move is legal, False otherwise
+        """
+
+        start = move.start
+        piece = self.pieces[start[0]][start[1]]
+        if piece is None or piece.color != self.turn:
+            return False
+
+        if piece.piece_type == PAWN:
+            candidates = []
+            for end in piece.get_moves():
+                self.append_pawn_move(candidates, start, end)
+            self.append_special_moves(candidates, self.turn, True)
+        else:
+            candidates = [Move(start, end) for end in piece.get_moves()]
+            if piece.piece_type == KING:
+                self.append_special_moves(candidates, self.turn, False)
+
+        return move in candidates and len(self.filter_legal([move], restrictions)) == 1
+
+    def is_capture(self, move):
+        """
+        Checks if a move captures a piece.
+
+        :param move: the Move
+        :return: True if there is an enemy piece on its end square or it is an en passant capture, False otherwise
+        """
+
+        start, end = move.start, move.end
+        if self.pieces[end[0]][end[1]] is not None:
+            return True
+
+        return start[0] != end[0] and self.pieces[start[0]][start[1]].piece_type == PAWN
+
+    def filter_legal(self, moves, restrictions=None):
+        """
+        A method that keeps the legal moves among pseudo-legal moves of the side to move.
+        They are filtered with the pins and the check mask, which are computed once for the position, so only the
+        king moves and the rare en passant captures need to look at the attacks.
+
+        :param moves: a list of pseudo-legal Move objects
+        :param restrictions: the result of pins_and_checks for the position, or None to compute it
+        :return: a list of the legal Move objects
+        """
+
+        color = self.turn
+        king = self.king_positions[color]
+        if king is None:
+            return moves
+
+        checkers, check_mask, pins = restrictions or self.pins_and_checks()
+        enemy = not color
+        pieces = self.pieces
+        legal = []
+
+        for move in moves:
+            start, end = move.start, move.end
+            if start == king:
+                # castling can't start in check or pass through an attacked square
+                if end[0] - start[0] == 2 or end[0] - start[0] == -2:
+                    if checkers or self.is_attacked(((start[0] + end[0]) // 2, end[1]), enemy) or \
+                            self.is_attacked(end, enemy):
+                        continue
+                elif self.is_attacked(end, enemy, king):
+                    continue
+            elif checkers > 1:
+                # only the king can escape a double check
+                continue
+            elif end == self.en_passant and pieces[start[0]][start[1]].piece_type == PAWN:
+                # taking two pawns off the same row can uncover the king, so the capture is tried out
+                self.push(move)
+                exposed = self.is_attacked(king, enemy)
+                self.pop()
+                if exposed:
+                    continue
+            else:
+                if check_mask is not None and end not in check_mask:
+                    continue
+                pin = pins.get(start)
+                if pin is not None and end not in pin:
+                    continue
+            legal.append(move)
+
+        return legal
+
+    def is_checkmate(self):
+        """
+        Checks if the side to move is checkmated.
+
+        :return: True if it is in check and has no legal moves, False otherwise
+        """
+
+        return self.is_check() and not self.legal_moves()
+
+    def is_stalemate(self):
+        """
+        Checks if the side to move is stalemated.
+
+        :return: True if it is not in check and has no legal moves, False otherwise
+        """
+
+        return not self.is_check() and not self.legal_moves()
+
+    def is_fifty_moves(self):
+        """
+        Checks the fifty-move rule.
+
+        :return: True if no pawn moved and nothing was captured for fifty moves of each side, False otherwise
+        """
+
+        return self.halfmove_clock >= 100
+
+    def is_repetition(self, count=3):
         """
-        A static method that draws the checkered board.
+        Checks if the current position was reached a number of times, by comparing the Zobrist keys of the
+        positions with the same side to move since the last capture or pawn move.
+
+        :param count: the number of times, including the current one
+        :return: True if the position was reached that many times, False otherwise
+        """
+
+        seen = 1
+        index = len(self.move_stack) - 2
+        root_size = len(self.root_hashes)
+
+        for ply in range(2, self.halfmove_clock + 1, 2):
+            if index >= 0:
+                key = self.move_stack[index].hash
+            elif root_size + index >= 0:
+                key = self.root_hashes[root_size + index]
+            else:
+                break
+
+            if key == self.hash:
+                seen += 1
+                if seen >= count:
+                    return True
+            index -= 2
+
+        return False
+
+    def hash_history(self):
+        """
+        Lists the keys of the positions reached since the last capture or pawn move, the only ones the current
+        position can repeat. A board created from a packed position recognises repetitions once they are given to it
+        as its root hashes.
+
+        :return: a list of Zobrist keys, from the oldest to the latest before the current position
+        """
+
+        keys = self.root_hashes + [record.hash for record in self.move_stack]
+        return keys[max(len(keys) - self.halfmove_clock, 0):]
+
+    def is_insufficient_material(self):
+        """
+        Checks if neither side has the material to checkmate, which is the case with the kings alone or with a single
+        knight or bishop besides them.
+
+        :return: True if no checkmate is possible, False otherwise
+        """
+
+        minor_pieces = 0
+        for row in self.pieces:
+            for piece in row:
+                if piece is not None and piece.piece_type != KING:
+                    if piece.piece_type == PAWN or piece.piece_type == ROOK or piece.piece_type == QUEEN:
+                        return False
+                    minor_pieces += 1
+
+        return minor_pieces <= 1
+
+    def outcome(self):
+        """
+        A method that checks if the game is over.
+
+        :return: None if the game goes on, otherwise a tuple consisting of the result, such as 1-0 or 1/2-1/2,
+         and the reason the game ended
+        """
+
+        if not self.legal_moves():
+            if self.is_check():
+                return ('0-1' if self.turn == WHITE else '1-0'), 'checkmate'
+            return DRAW, 'stalemate'
+        if self.is_insufficient_material():
+            return DRAW, 'insufficient material'
+        if self.is_fifty_moves():
+            return DRAW, 'the fifty-move rule'
+        if self.is_repetition():
+            return DRAW, 'threefold repetition'
+
+        return None
+
+    def update_outcome(self):
+        """
+        A method that ends the game if it is over, recording its result and the reason.
 
-        :param window: the window where it will be drawn
         :return: None
         """
 
-        # draws the checkered board
-        window.fill(BLACK_COLOR)
-        for row in range(ROWS):
-            for col in range(row % 2, ROWS, 2):
-                pygame.draw.rect(window, WHITE_COLOR, (row * SQUARE_SIZE, col * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+        outcome = self.outcome()
+        if outcome is not None:
+            self.game_ended = True
+            self.result, self.end_reason = outcome
 
-    def move_piece(self, piece, new_position):
+    def move_piece(self, piece, new_position, promotion=QUEEN):
         """
-        A method that makes a move after it is validated.
+        A method that makes a move after it is validated, and checks if it ended the game.
 
         :param piece: the piece to move
         :param new_position: the position it is trying to move to
+        :param promotion: the type of the piece a pawn becomes if it reaches the last row
+        :return: True if the move was made, False if it is not legal
+        """
+
+        # validates the move against the legal moves and updates the board pieces matrix
+        for move in self.legal_moves():
+            if move.start == piece.position and move.end == new_position and move.promotion in (None, promotion):
+                self.push(move)
+                self.update_outcome()
+                return True
+
+        return False
+
+    def push(self, move):
+        """
+        A method that makes a move without validating it and saves what is needed to take it back.
+        The pieces are moved in place, so no copy of the board is made.
+
+        :param move: the Move to make, which is expected to be valid
+        :return: None
+        """
+
+        start, end, promotion = move
+        pieces = self.pieces
+        piece = pieces[start[0]][start[1]]
+        captured = pieces[end[0]][end[1]]
+
+        # a pawn moving diagonally to an empty square captures en passant the pawn that skipped it
+        if captured is None and piece.piece_type == PAWN and start[0] != end[0]:
+            captured = pieces[end[0]][start[1]]
+
+        self.move_stack.append(UndoRecord(move, piece, captured, self.turn, self.castling_rights, self.en_passant,
+                                          self.game_ended, self.hash, self.halfmove_clock))
+
+        # the captured piece still knows its position, which is where pop puts it back
+        if captured is not None:
+            self._remove_piece(captured.position)
+
+        self._remove_piece(start)
+        if promotion is not None:
+            self._put_piece(PIECE_CLASSES[promotion](piece.color, end, pieces), end)
+        else:
+            self._put_piece(piece, end)
+
+        # castling is the king's move two squares to the side, which also moves the rook next to it
+        if piece.piece_type == KING and (end[0] - start[0] == 2 or end[0] - start[0] == -2):
+            rook_start, rook_end = CASTLING_ROOKS[end[0]]
+            self._put_piece(self._remove_piece((rook_start, end[1])), (rook_end, end[1]))
+
+        # a king or rook leaving its square, or a rook being captured, loses the matching castling rights
+        if self.castling_rights and (start in CASTLING_SQUARES or end in CASTLING_SQUARES):
+            self.hash ^= CASTLING_KEYS[self.castling_rights]
+            self.castling_rights &= ~(CASTLING_SQUARES.get(start, 0) | CASTLING_SQUARES.get(end, 0))
+            self.hash ^= CASTLING_KEYS[self.castling_rights]
+
+        # a pawn moving two squares can be captured en passant on the square it skipped, which is only recorded
+        # if an enemy pawn is next to it, so the Zobrist key of the position only changes if the capture is possible
+        if self.en_passant is not None:
+            self.hash ^= EN_PASSANT_KEYS[self.en_passant[0]]
+        self.en_passant = None
+        if piece.piece_type == PAWN and (end[1] - start[1] == 2 or end[1] - start[1] == -2):
+            for column in (end[0] - 1, end[0] + 1):
+                if 0 <= column < 8:
+                    neighbour = pieces[column][end[1]]
+                    if neighbour is not None and neighbour.piece_type == PAWN and neighbour.color != piece.color:
+                        self.en_passant = (start[0], (start[1] + end[1]) // 2)
+                        self.hash ^= EN_PASSANT_KEYS[start[0]]
+                        break
+
+        # the halfmove clock counts the moves since the last capture or pawn move
+        if captured is not None or piece.piece_type == PAWN:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+        if self.turn == BLACK:
+            self.fullmove_number += 1
+
+        self.turn = not self.turn
+        self.hash ^= BLACK_TO_MOVE_KEY
+
+    def pop(self):
+        """
+        A method that takes back the last move made with push.
+
+        :return: the Move that was taken back
+        """
+
+        record = self.move_stack.pop()
+        start, end, promotion = record.move
+        piece = record.piece
+
+        # the promoted piece is dropped and the pawn is put back
+        self._remove_piece(end)
+        self._put_piece(piece, start)
+        if record.captured is not None:
+            self._put_piece(record.captured, record.captured.position)
+
+        if piece.piece_type == KING and (end[0] - start[0] == 2 or end[0] - start[0] == -2):
+            rook_start, rook_end = CASTLING_ROOKS[end[0]]
+            self._put_piece(self._remove_piece((rook_end, end[1])), (rook_start, end[1]))
+
+        self.turn = record.turn
+        self.castling_rights = record.castling_rights
+        self.en_passant = record.en_passant
+        self.game_ended = record.game_ended
+        if not self.game_ended:
+            self.result = None
+            self.end_reason = None
+        self.hash = record.hash
+        self.halfmove_clock = record.halfmove_clock
+        if record.turn == BLACK:
+            self.fullmove_number -= 1
+
+        return record.move
+
+    def _put_piece(self, piece, position):
+        """
+        Places a piece on an empty square.
+        Every change of the board goes through this method and _remove_piece, so subclasses can keep
+        their own representation of the position in sync. The attack counts only change along the rays that
+        go through the square, and for the attacks of the piece itself. The key and the evaluation sums change
+        by the values of the piece on the square.
+
+        :param piece: the piece to place
+        :param position: the position to place it on
         :return: None
         """
 
-        # validates the move and updates the board pieces matrix
-        if piece.validate_move(new_position):
-            x, y = piece.position
-            self.pieces[x][y] = None
-            piece.position = new_position
+        square = position[1] * 8 + position[0]
+        self._update_rays_through(square, -1)
+        self.pieces[position[0]][position[1]] = piece
+        self._update_attacks(piece, square, 1)
+        piece.position = position
+        color, piece_type = piece.color, piece.piece_type
+        self.hash ^= PIECE_KEYS[color][piece_type][square]
+        self.middlegame_score += MIDDLEGAME_TABLES[color][piece_type][square]
+        self.endgame_score += ENDGAME_TABLES[color][piece_type][square]
+        self.phase += PHASE_WEIGHTS[piece_type]
+        self.piece_count += 1
+        if piece_type == KING:
+            self.king_positions[color] = position
+
+    def _remove_piece(self, position):
+        """
+        Removes the piece placed on a square.
 
-            # if the captured piece is a King, prepare the game for ending
-            if isinstance(self.pieces[new_position[0]][new_position[1]], King):
-                self.game_ended = True
+        :param position: the position of the piece
+        :return: the removed piece
+        """
 
-            self.pieces[piece.position[0]][piece.position[1]] = piece
+        square = position[1] * 8 + position[0]
+        piece = self.pieces[position[0]][position[1]]
+        self._update_attacks(piece, square, -1)
+        self.pieces[position[0]][position[1]] = None
+        self._update_rays_through(square, 1)
+        color, piece_type = piece.color, piece.piece_type
+        self.hash ^= PIECE_KEYS[color][piece_type][square]
+        self.middlegame_score -= MIDDLEGAME_TABLES[color][piece_type][square]
+        self.endgame_score -= ENDGAME_TABLES[color][piece_type][square]
+        self.phase -= PHASE_WEIGHTS[piece_type]
+        self.piece_count -= 1
 
-            if not self.game_ended:
-                self.turn = not self.turn
+        return piece
 
     @staticmethod
     def get_square_from_coords(position):
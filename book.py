@@ -0,0 +1,232 @@
+"""
+An opening book, which answers the first moves of a game without searching.
+
+The book is a file of fixed-size entries, each holding the key of a position, a move packed by Move.to_int and its
+weight, sorted by key. The file is memory-mapped and the entries of a position are found by bisection, so opening
+a book loads nothing and every process that opens the same book shares its pages.
+
+A book is compiled from a collection of PGN files. Every move played in the first plies of the games is weighted
+by the results: two points for a win of the side that played it and one for a draw or an unfinished game:
+python book.py build book.bin games.pgn --plies 20
+
+The moves the book knows for a position are listed by:
+python book.py probe book.bin [FEN]
+"""
+
+import argparse
+import bisect
+import mmap
+import random
+import struct
+import sys
+from board import Board
+from move import Move
+from pgn import read_games
+from utils import WHITE
+
+# the key of the position, the packed move and its weight
+ENTRY_STRUCT = struct.Struct('<QHH')
+MAX_WEIGHT = 0xFFFF
+
+WEIGHTED = 'weighted'
+BEST = 'best'
+
+
+class _Keys:
+    """
+    A read-only sequence of the keys of a book file, so the bisect module can search the entries in place.
+    """
+
+    def __init__(self, data):
+        """
+        Class constructor
+
+        :param data: the mapped book file
+        """
+
+        self.data = data
+
+    def __len__(self):
+        return len(self.data) // ENTRY_STRUCT.size
+
+    def __getitem__(self, index):
+        return ENTRY_STRUCT.unpack_from(self.data, index * ENTRY_STRUCT.size)[0]
+
+
+class OpeningBook:
+    """
+    A memory-mapped opening book.
+    """
+
+    def __init__(self, path):
+        """
+        Class constructor
+        Maps the book file without reading it.
+
+        :param path: the path of the book file
+        """
+
+        with open(path, 'rb') as stream:
+            size = stream.seek(0, 2)
+            if size % ENTRY_STRUCT.size:
+                raise ValueError(f'{path} is not an opening book')
+            # an empty file can't be mapped, and has no entries anyway
+            self.data = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+        self.keys = _Keys(self.data)
+
+    def __len__(self):
+        """
+        The number of entries of the book.
+
+        :return: the number of entries
+        """
+
+        return len(self.keys)
+
+    def entries(self, board):
+        """
+        A method that finds the moves the book knows for the position of a board.
+        Two positions can share a key, so only the moves that are legal on the board are kept.
+
+        :param board: the current board
+        :return: a list of (Move, weight) tuples, by decreasing weight
+        """
+
+        key = board.hash
+        index = bisect.bisect_left(self.keys, key)
+        entries = []
+        while index < len(self.keys):
+            entry_key, packed, weight = ENTRY_STRUCT.unpack_from(self.data, index * ENTRY_STRUCT.size)
+            if entry_key != key:
+                break
+            move = Move.from_int(packed)
+            if board.is_legal(move):
+                entries.append((move, weight))
+            index += 1
+
+        entries.sort(key=lambda entry: entry[1], reverse=True)
+        return entries
+
+    def choose(self, board, mode=WEIGHTED, generator=random):
+        """
+        A method that picks a book move for the position of a board.
+
+        :param board: the current board
+        :param mode: WEIGHTED to pick a move at random in proportion to its weight, or BEST for the heaviest one
+        :param generator: the source of randomness of the weighted picks
+        :return: the Move, or None if the position is not in the book
+        """
+
+        entries = self.entries(board)
+        if not entries:
+            return None
+        if mode == BEST:
+            return entries[0][0]
+
+        moves, weights = zip(*entries)
+        return generator.choices(moves, weights)[0]
+
+    def close(self):
+        """
+        A method that unmaps the book file.
+
+        :return: None
+        """
+
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+
+def build_book(pgn_paths, output, max_plies=20, min_count=1):
+    """
+    Compiles an opening book from PGN files.
+
+    :param pgn_paths: the paths of the PGN files
+    :param output: the path of the book file to write
+    :param max_plies: the number of plies of every game that go into the book
+    :param min_count: the number of games a move must be played in to go into the book
+    :return: the number of entries written
+    """
+
+    weights = {}
+    counts = {}
+    games = 0
+
+    for path in pgn_paths:
+        with open(path, encoding='utf-8', errors='replace') as stream:
+            for game in read_games(stream):
+                games += 1
+                result = game.headers.get('Result', '*')
+                try:
+                    for ply, move in enumerate(game.moves()):
+                        if ply >= max_plies:
+                            break
+                        # the move is already played, so the position before it comes from its undo record
+                        record = game.board.move_stack[-1]
+                        key, color = record.hash, record.turn
+
+                        if result not in ('1-0', '0-1'):
+                            points = 1
+                        elif result == ('1-0' if color == WHITE else '0-1'):
+                            points = 2
+                        else:
+                            points = 0
+
+                        entry = (key, move.to_int())
+                        weights[entry] = weights.get(entry, 0) + points
+                        counts[entry] = counts.get(entry, 0) + 1
+                except ValueError as error:
+                    print(f'{path}, game {games}: {error}', file=sys.stderr)
+
+    # the moves that never scored are left out, and the weights are scaled down to fit their 16 bits
+    entries = sorted(entry for entry in weights if weights[entry] > 0 and counts[entry] >= min_count)
+    scale = max([weights[entry] for entry in entries], default=0) / MAX_WEIGHT
+
+    with open(output, 'wb') as stream:
+        for entry in entries:
+            weight = weights[entry] if scale <= 1 else max(1, int(weights[entry] / scale))
+            stream.write(ENTRY_STRUCT.pack(entry[0], entry[1], weight))
+
+    return len(entries)
+
+
+def main():
+    """
+    Parses the command line arguments and builds or probes a book.
+
+    :return: None
+    """
+
+    parser = argparse.ArgumentParser(description='Builds and probes opening books.')
+    subparsers = parser.add_subparsers(dest='mode', required=True)
+
+    build_parser = subparsers.add_parser('build', help='compile a book from PGN files')
+    build_parser.add_argument('book', help='the path of the book file to write')
+    build_parser.add_argument('pgn', nargs='+', help='the PGN files')
+    build_parser.add_argument('--plies', type=int, default=20, help='the number of plies of every game to keep')
+    build_parser.add_argument('--min-count', type=int, default=1,
+                              help='the number of games a move must be played in')
+
+    probe_parser = subparsers.add_parser('probe', help='list the book moves of a position')
+    probe_parser.add_argument('book', help='the path of the book file')
+    probe_parser.add_argument('fen', nargs='*', help='the position, the starting one by default')
+    arguments = parser.parse_args()
+
+    if arguments.mode == 'build':
+        count = build_book(arguments.pgn, arguments.book, arguments.plies, arguments.min_count)
+        print(f'{count} entries written to {arguments.book}')
+    else:
+        book = OpeningBook(arguments.book)
+        board = Board.from_fen(' '.join(arguments.fen)) if arguments.fen else Board()
+        entries = book.entries(board)
+        total = sum(weight for move, weight in entries)
+        for move, weight in entries:
+            print(f'{move.to_uci()} {weight} {weight / total:.1%}')
+        if not entries:
+            print('the position is not in the book')
+        book.close()
+
+
+if __name__ == '__main__':
+    main()
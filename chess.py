@@ -2,10 +2,14 @@
 Main class responsible for running the game.
 """
 
+import os
 import sys
+import time
 from ai import AI
-from board import Board
+from board import Board, DRAW
+from pgn import PGNWriter
 import pygame
+from renderer import Renderer
 from utils import WIDTH, HEIGHT, WHITE
 
 
@@ -18,65 +22,143 @@ def main():
 
     global run
 
-    # checking the run argument, printing usage instructions if invalid
-    if len(sys.argv) != 2:
-        print(f"Usage: python {sys.argv[0]} <PVP/AI>")
+    # checking the run arguments, printing usage instructions if invalid
+    if len(sys.argv) not in (2, 3):
+        print(f"Usage: python {sys.argv[0]} <PVP/AI> [PGN file]")
         exit(1)
 
     player_type = sys.argv[1]
     if player_type not in ['PVP', 'AI']:
-        print(f"Usage: python {sys.argv[0]} <PVP/AI>")
+        print(f"Usage: python {sys.argv[0]} <PVP/AI> [PGN file]")
         exit(2)
 
+    pgn_path = sys.argv[2] if len(sys.argv) == 3 else None
+
     # setting up pygame related variables
     FPS = 60
+    AI_TIME_LIMIT = 1000
+    # the AI plays from an opening book and looks the endings up in endgame tables if they were built, see book.py
+    # and tablebase.py
+    BOOK_PATH = 'book.bin'
+    TABLEBASE_PATH = 'tablebases'
     WINDOW = pygame.display.set_mode((WIDTH, HEIGHT))
     clock = pygame.time.Clock()
 
     # instancing classes
     board = Board()
-    ai = AI()
+    renderer = Renderer()
+    # only a game against the AI loads its book and tablebases
+    ai = None
+    if player_type == 'AI':
+        ai = AI(depth=None, time_limit=AI_TIME_LIMIT, book=BOOK_PATH if os.path.exists(BOOK_PATH) else None,
+                tablebases=TABLEBASE_PATH if os.path.isdir(TABLEBASE_PATH) else None)
+
+    caption = None
 
     while run:
-        clock.tick(FPS)
-        pygame.display.set_caption(f'Chess - {"white" if board.turn == WHITE else "black"} moves')
+        new_caption = f'Chess - {"white" if board.turn == WHITE else "black"} moves'
+        if new_caption != caption:
+            caption = new_caption
+            pygame.display.set_caption(caption)
 
         # check if game end condition is met
         if board.game_ended:
             run = False
-            print(f'\n{"White" if board.turn == WHITE else "Black"} won!')
+            if board.result == DRAW:
+                print(f'\nDraw by {board.end_reason}!')
+            else:
+                print(f'\n{"White" if board.result == "1-0" else "Black"} won by {board.end_reason}!')
 
-        # drawing the board and pieces
-        board.draw_board(WINDOW)
-        for row in board.pieces:
-            for piece in row:
-                if piece is not None:
-                    piece.draw(WINDOW)
+        # drawing only the squares that changed and updating only their part of the window
+        rects = renderer.update(WINDOW, board)
+        if rects:
+            pygame.display.update(rects)
 
-        # checking player type
-        if player_type == 'PVP':
-            player_event(board)
+        if not run:
+            break
 
-        if player_type == 'AI':
+        # checks if it's the AI's turn and lets it think in the background if yes, polling it every frame
+        if player_type == 'AI' and ai.is_turn(board):
+            clock.tick(FPS)
+            ai_event(board, ai, renderer)
+        # otherwise it sleeps until the player does something
+        else:
+            player_event(board, renderer)
 
-            # checks if it's the AI's turn and moves randomly if yes
-            if ai.is_turn(board):
-                ai.move_random_piece(board)
-            else:
-                player_event(board)
+    # stops the AI if the window was closed while it was thinking, and its worker processes
+    if ai is not None:
+        ai.close()
 
-        pygame.display.update()
+    if pgn_path is not None:
+        save_game(pgn_path, board, player_type, ai)
 
 
-def player_event(board):
+def save_game(path, board, player_type, ai):
     """
-    A method that implements a player's turn.
+    A method that appends the game that was played to a PGN file.
+
+    :param path: the path of the PGN file
+    :param board: the board the game was played on
+    :param player_type: PVP or AI
+    :param ai: the AI, or None in a PVP game
+    :return: None
+    """
+
+    # an unfinished game has no result
+    result = board.result if board.game_ended else '*'
+
+    if player_type == 'AI':
+        white, black = ('AI', 'Player') if ai.color == WHITE else ('Player', 'AI')
+    else:
+        white, black = 'Player', 'Player'
+
+    headers = {'Event': 'Casual game', 'Site': 'python-chess', 'Date': time.strftime('%Y.%m.%d'), 'Round': '-',
+               'White': white, 'Black': black, 'Result': result}
+    with open(path, 'a', encoding='utf-8') as stream:
+        PGNWriter(stream).write_board(board, headers)
+
+
+def ai_event(board, ai, renderer):
+    """
+    A method that implements the AI's turn without blocking the window.
+    It starts the search, makes the move once it is ready and only listens for the window being closed meanwhile.
+
     :param board: the current board
+    :param ai: the AI
+    :param renderer: the renderer, which has to redraw everything if the window was covered
     :return: None
     """
 
     global run
+    if not ai.is_thinking():
+        ai.start_thinking(board)
+
+    move = ai.poll()
+    if move is not None:
+        board.move_piece(board.pieces[move.start[0]][move.start[1]], move.end, move.promotion)
+
     for event in pygame.event.get():
+        # if the player closes the window
+        if event.type == pygame.QUIT:
+            run = False
+            ai.cancel()
+
+        if event.type == pygame.WINDOWEXPOSED:
+            renderer.invalidate()
+
+
+def player_event(board, renderer):
+    """
+    A method that implements a player's turn.
+    It waits for the next event, so the game uses no CPU while the player thinks.
+
+    :param board: the current board
+    :param renderer: the renderer, which has to redraw everything if the window was covered
+    :return: None
+    """
+
+    global run
+    for event in [pygame.event.wait()] + pygame.event.get():
         # if the player closes the window
         if event.type == pygame.QUIT:
             run = False
@@ -88,6 +170,9 @@ def player_event(board):
             board.process_input(position)
             board.can_move()
 
+        if event.type == pygame.WINDOWEXPOSED:
+            renderer.invalidate()
+
 
 if __name__ == '__main__':
     run = True
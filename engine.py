@@ -0,0 +1,370 @@
+"""
+A search engine that looks for the best move of a position.
+
+It uses negamax with alpha-beta pruning, and a quiescence search on captures at the leaves, so the evaluation
+is only trusted in quiet positions. Only legal moves are searched, so a position without any is a checkmate or a
+stalemate, and a repeated position or one reached after fifty moves without progress is scored as a draw.
+The results are kept in a transposition table, so positions reached through different move orders are only
+searched once. The search deepens one ply at a time, so it can be stopped by a time or node budget and still
+return the best move of the last completed depth. The positions with few enough pieces are looked up in the endgame
+tables instead of being searched, when the engine is given them.
+"""
+
+import time
+from evaluation import evaluate
+from ordering import MoveOrdering, capture_score
+from tablebase import MAX_PIECES
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
+MATE_SCORE = 100000
+# scores above this one are mates, which are stored in the transposition table relative to the position
+MATE_BOUND = MATE_SCORE - 1000
+INFINITY = 1000000
+MAX_DEPTH = 64
+
+# how many nodes are searched between two checks of the budgets
+CHECK_INTERVAL = 256
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the time or node budget is used up.
+    """
+
+
+class Engine:
+    """
+    The implementation of the alpha-beta search.
+    """
+
+    def __init__(self, depth=4, hash_size_mb=16, time_limit=None, node_limit=None, tablebases=None):
+        """
+        Class constructor
+
+        :param depth: the default maximum depth of the search, in plies, or None to only stop on a budget
+        :param hash_size_mb: the memory cap of the transposition table, in megabytes
+        :param time_limit: the default time budget of a search, in milliseconds, or None
+        :param node_limit: the default node budget of a search, or None
+        :param tablebases: the Tablebases the positions with few pieces are looked up in, or None
+        """
+
+        self.depth = depth
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.nodes = 0
+        self.completed_depth = 0
+        self.iterations = []
+        self.table = TranspositionTable(hash_size_mb)
+        self.ordering = MoveOrdering()
+        self.tablebases = tablebases
+        self._deadline = None
+        self._node_limit = None
+        self._stop_event = None
+
+    def search(self, board, depth=None, time_limit=None, node_limit=None, stop_event=None, root_moves=None,
+               callback=None):
+        """
+        A method that searches the position with iterative deepening, until the maximum depth is reached or a
+        budget is used up. The first ply is always completed, so there is always a move to return, unless the
+        search is cancelled through the stop event.
+
+        :param board: the current board, which is left unchanged
+        :param depth: the maximum depth of the search in plies, or None for the default one
+        :param time_limit: the time budget in milliseconds, or None for the default one
+        :param node_limit: the node budget, or None for the default one
+        :param stop_event: a threading.Event that cancels the search from another thread when it is set, or None
+        :param root_moves: a list of the root Moves to search, or None to search all of them
+        :param callback: a function called with the depth, the best Move and its score after every completed depth,
+         or None
+        :return: a tuple consisting of the best Move of the last completed depth, or None if there are no moves,
+         and its score
+        """
+
+        depth = depth or self.depth or MAX_DEPTH
+        time_limit = time_limit or self.time_limit
+        node_limit = node_limit or self.node_limit
+        start = time.perf_counter()
+
+        self.nodes = 0
+        self.completed_depth = 0
+        self.iterations = []
+        self.table.new_search()
+        self.ordering.new_search()
+        self._deadline = None
+        self._node_limit = None
+        self._stop_event = stop_event
+        stack_size = len(board.move_stack)
+        best_move, best_score = None, 0
+
+        # a position in the tables has a perfect answer, which needs no search
+        if self.tablebases is not None and root_moves is None and board.piece_count <= MAX_PIECES:
+            found = self.tablebases.best_move(board)
+            if found is not None:
+                move, (outcome, plies) = found
+                score = self.tablebase_score(outcome, plies, 0)
+                self.completed_depth = 1
+                self.iterations.append((1, move, score))
+                if callback is not None:
+                    callback(1, move, score)
+                return move, score
+
+        for current_depth in range(1, depth + 1):
+            try:
+                move, score = self.search_root(board, current_depth, root_moves)
+            except SearchTimeout:
+                # the search was interrupted in the middle of a line, so the moves it made are taken back
+                while len(board.move_stack) > stack_size:
+                    board.pop()
+                break
+
+            best_move, best_score = move, score
+            self.completed_depth = current_depth
+            self.iterations.append((current_depth, move, score))
+            if callback is not None:
+                callback(current_depth, move, score)
+            if move is None or best_score > MATE_BOUND or best_score < -MATE_BOUND:
+                break
+
+            # the budgets only apply after the first depth, which is needed to have a move at all
+            if time_limit is not None:
+                self._deadline = start + time_limit / 1000
+                if time.perf_counter() >= self._deadline:
+                    break
+            if node_limit is not None:
+                self._node_limit = node_limit
+                if self.nodes >= node_limit:
+                    break
+
+        return best_move, best_score
+
+    def search_root(self, board, depth, root_moves=None):
+        """
+        A method that searches every move of the root position to a fixed depth.
+
+        :param board: the current board
+        :param depth: the depth of the search, in plies
+        :param root_moves: a list of the root Moves to search, or None to search all of them
+        :return: a tuple consisting of the best Move, or None if there are no moves, and its score
+        """
+
+        best_move = None
+        alpha, beta = -INFINITY, INFINITY
+
+        entry = self.table.probe(board.hash)
+        hash_move = entry.move if entry is not None else None
+        moves = list(root_moves) if root_moves is not None else board.legal_moves()
+        if not moves:
+            return None, -MATE_SCORE if board.is_check() else 0
+
+        for move in self.ordering.sort(board, moves, 0, hash_move):
+            board.push(move)
+            score = -self.negamax(board, depth - 1, -beta, -alpha, 1)
+            board.pop()
+
+            if best_move is None or score > alpha:
+                alpha = score
+                best_move = move
+
+        # only the best of all the root moves is the best move of the position
+        if best_move is not None and root_moves is None:
+            self.table.store(board.hash, depth, alpha, EXACT, best_move)
+
+        return best_move, alpha
+
+    def principal_variation(self, board, move, max_length=MAX_DEPTH):
+        """
+        A method that follows the best moves stored in the transposition table from a move of the position,
+        which is the line the search expects to be played.
+
+        :param board: the current board, which is left unchanged
+        :param move: the first Move of the line
+        :param max_length: the maximum number of moves of the line
+        :return: a list of Move objects
+        """
+
+        line = [move]
+        board.push(move)
+        seen = {board.hash}
+
+        # stops at a missing or illegal move, or at a repetition, which would go on forever
+        while len(line) < max_length:
+            entry = self.table.probe(board.hash)
+            if entry is None or entry.move is None or not board.is_legal(entry.move):
+                break
+            board.push(entry.move)
+            line.append(entry.move)
+            if board.hash in seen:
+                break
+            seen.add(board.hash)
+
+        for i in range(len(line)):
+            board.pop()
+
+        return line
+
+    @staticmethod
+    def tablebase_score(outcome, plies, ply):
+        """
+        Converts a result of the tables to a score of the search.
+
+        :param outcome: 1 if the side to move wins, 0 if it is a draw or -1 if it loses
+        :param plies: the number of plies to the mate
+        :param ply: the distance of the position from the root
+        :return: the score, from the point of view of the side to move
+        """
+
+        if outcome > 0:
+            return MATE_SCORE - ply - plies
+        if outcome < 0:
+            return -MATE_SCORE + ply + plies
+
+        return 0
+
+    def check_budget(self):
+        """
+        A method that stops the search by raising SearchTimeout when a budget is used up or it is cancelled.
+
+        :return: None
+        """
+
+        if self._stop_event is not None and self._stop_event.is_set():
+            raise SearchTimeout
+        if self._deadline is not None and time.perf_counter() >= self._deadline:
+            raise SearchTimeout
+        if self._node_limit is not None and self.nodes >= self._node_limit:
+            raise SearchTimeout
+
+    def negamax(self, board, depth, alpha, beta, ply):
+        """
+        A method that searches a position with alpha-beta pruning.
+
+        :param board: the current board
+        :param depth: the remaining depth, in plies
+        :param alpha: the score the side to move is already guaranteed
+        :param beta: the score the opponent is already guaranteed
+        :param ply: the distance from the root, used to prefer faster mates
+        :return: the score of the position, from the point of view of the side to move
+        """
+
+        if depth <= 0:
+            return self.quiescence(board, alpha, beta, ply)
+
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            self.check_budget()
+
+        # a position that repeats one from earlier in the game or the search is a draw, since the side that
+        # could improve on it would have done so the first time
+        if board.halfmove_clock >= 100 or board.is_repetition(2):
+            return 0
+
+        if self.tablebases is not None and board.piece_count <= MAX_PIECES:
+            result = self.tablebases.probe(board)
+            if result is not None:
+                return self.tablebase_score(*result, ply)
+
+        key = board.hash
+        original_alpha = alpha
+
+        # uses the result of an earlier search of the same position if it is deep enough
+        entry = self.table.probe(key)
+        hash_move = None
+        if entry is not None:
+            hash_move = entry.move
+            if entry.depth >= depth:
+                score = entry.score
+                if score > MATE_BOUND:
+                    score -= ply
+                elif score < -MATE_BOUND:
+                    score += ply
+
+                if entry.bound == EXACT:
+                    return score
+                if entry.bound == LOWER_BOUND and score >= beta:
+                    return score
+                if entry.bound == UPPER_BOUND and score <= alpha:
+                    return score
+
+        best = -INFINITY
+        best_move = None
+
+        # the moves are generated in stages, so the later ones are never generated after a cutoff
+        for move in self.ordering.moves(board, ply, hash_move):
+            board.push(move)
+            score = -self.negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            board.pop()
+
+            if score > best:
+                best = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        self.ordering.store_cutoff(board, move, ply, depth)
+                        break
+
+        if best_move is None:
+            # checkmated, the sooner the worse, or stalemated
+            return -MATE_SCORE + ply if board.is_check() else 0
+
+        if best <= original_alpha:
+            bound = UPPER_BOUND
+        elif best >= beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+
+        # mate scores are stored relative to this position, so they stay correct wherever it is reached from
+        stored = best
+        if stored > MATE_BOUND:
+            stored += ply
+        elif stored < -MATE_BOUND:
+            stored -= ply
+        self.table.store(key, depth, stored, bound, best_move)
+
+        return best
+
+    def quiescence(self, board, alpha, beta, ply):
+        """
+        A method that only searches captures and promotions, until the position is quiet enough to be evaluated.
+        A side in check can't choose to stand still, so all of its moves are searched.
+
+        :param board: the current board
+        :param alpha: the score the side to move is already guaranteed
+        :param beta: the score the opponent is already guaranteed
+        :param ply: the distance from the root
+        :return: the score of the position, from the point of view of the side to move
+        """
+
+        self.nodes += 1
+        if self.nodes % CHECK_INTERVAL == 0:
+            self.check_budget()
+
+        if board.is_check():
+            moves = board.legal_moves()
+            if not moves:
+                return -MATE_SCORE + ply
+            best = -INFINITY
+        else:
+            # the side to move can usually do at least as well as the current evaluation by not capturing
+            best = evaluate(board)
+            if best >= beta:
+                return best
+            if best > alpha:
+                alpha = best
+            moves = board.legal_moves(True)
+
+        moves.sort(key=lambda move: capture_score(board, move), reverse=True)
+        for move in moves:
+            board.push(move)
+            score = -self.quiescence(board, -beta, -alpha, ply + 1)
+            board.pop()
+
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        return best
@@ -0,0 +1,171 @@
+"""
+The static evaluation of a position: material plus piece-square tables, for the middlegame and the endgame.
+
+The tables are written from white's point of view, with the eighth row first, the way a board is read.
+They are combined with the piece values into one table per color, piece type and square when the module is loaded,
+with the values of black negated, so the score of a position is their sum.
+
+The board keeps the middlegame and endgame sums and the game phase as running totals, which every piece placed
+or removed adjusts, so evaluating a position doesn't look at its squares. The phase is the material left besides
+the pawns, and the score goes from the middlegame sum to the endgame sum as it decreases.
+"""
+
+from utils import *
+
+PIECE_VALUES = (100, 320, 330, 500, 900, 20000)
+
+_PAWN_TABLE = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5, 5, 10, 25, 25, 10, 5, 5,
+    0, 0, 0, 20, 20, 0, 0, 0,
+    5, -5, -10, 0, 0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0,
+)
+
+_KNIGHT_TABLE = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0, 0, 0, 0, -20, -40,
+    -30, 0, 10, 15, 15, 10, 0, -30,
+    -30, 5, 15, 20, 20, 15, 5, -30,
+    -30, 0, 15, 20, 20, 15, 0, -30,
+    -30, 5, 10, 15, 15, 10, 5, -30,
+    -40, -20, 0, 5, 5, 0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+)
+
+_BISHOP_TABLE = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 10, 10, 5, 0, -10,
+    -10, 5, 5, 10, 10, 5, 5, -10,
+    -10, 0, 10, 10, 10, 10, 0, -10,
+    -10, 10, 10, 10, 10, 10, 10, -10,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+)
+
+_ROOK_TABLE = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    5, 10, 10, 10, 10, 10, 10, 5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    0, 0, 0, 5, 5, 0, 0, 0,
+)
+
+_QUEEN_TABLE = (
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 5, 5, 5, 0, -10,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    0, 0, 5, 5, 5, 5, 0, -5,
+    -10, 5, 5, 5, 5, 5, 0, -10,
+    -10, 0, 5, 0, 0, 0, 0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20,
+)
+
+_KING_TABLE = (
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    20, 30, 10, 0, 0, 10, 30, 20,
+)
+
+# in the endgame the pawns are worth more the closer they are to promoting, and the king belongs in the center
+_PAWN_ENDGAME_TABLE = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    80, 80, 80, 80, 80, 80, 80, 80,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    30, 30, 30, 30, 30, 30, 30, 30,
+    20, 20, 20, 20, 20, 20, 20, 20,
+    10, 10, 10, 10, 10, 10, 10, 10,
+    10, 10, 10, 10, 10, 10, 10, 10,
+    0, 0, 0, 0, 0, 0, 0, 0,
+)
+
+_KING_ENDGAME_TABLE = (
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10, 0, 0, -10, -20, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -30, 0, 0, 0, 0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+)
+
+# how much every piece type counts towards the phase, which is MAX_PHASE with all the pieces on the board
+PHASE_WEIGHTS = (0, 1, 1, 2, 4, 0)
+MAX_PHASE = 24
+
+
+def _build_tables(tables):
+    """
+    Combines the piece values and piece-square tables, mirroring them and negating them for black.
+
+    :param tables: the piece-square tables, indexed by piece type
+    :return: a table indexed by color, piece type and square index
+    """
+
+    combined = [None, None]
+    for color in (BLACK, WHITE):
+        sign = 1 if color == WHITE else -1
+        combined[color] = tuple(
+            tuple(sign * (PIECE_VALUES[piece_type] +
+                          table[(7 - (square >> 3) if color == WHITE else square >> 3) * 8 + (square & 7)])
+                  for square in range(64))
+            for piece_type, table in enumerate(tables))
+
+    return tuple(combined)
+
+
+# MIDDLEGAME_TABLES[color][piece_type][square] and ENDGAME_TABLES[color][piece_type][square]
+MIDDLEGAME_TABLES = _build_tables((_PAWN_TABLE, _KNIGHT_TABLE, _BISHOP_TABLE, _ROOK_TABLE, _QUEEN_TABLE, _KING_TABLE))
+ENDGAME_TABLES = _build_tables((_PAWN_ENDGAME_TABLE, _KNIGHT_TABLE, _BISHOP_TABLE, _ROOK_TABLE, _QUEEN_TABLE,
+                                _KING_ENDGAME_TABLE))
+
+
+def compute_totals(board):
+    """
+    Adds up the middlegame and endgame values and the phase of every piece on the board.
+    The board keeps them up to date afterwards.
+
+    :param board: the board
+    :return: a tuple consisting of the middlegame sum, the endgame sum and the phase
+    """
+
+    middlegame = endgame = phase = 0
+    for row in board.pieces:
+        for piece in row:
+            if piece is not None:
+                x, y = piece.position
+                middlegame += MIDDLEGAME_TABLES[piece.color][piece.piece_type][y * 8 + x]
+                endgame += ENDGAME_TABLES[piece.color][piece.piece_type][y * 8 + x]
+                phase += PHASE_WEIGHTS[piece.piece_type]
+
+    return middlegame, endgame, phase
+
+
+def evaluate(board):
+    """
+    Evaluates a position from the running totals of the board, blending the middlegame and endgame sums by the
+    phase.
+
+    :param board: the board
+    :return: the score in centipawns, from the point of view of the side to move
+    """
+
+    # promotions can take the phase above its starting value
+    phase = min(board.phase, MAX_PHASE)
+    score = (board.middlegame_score * phase + board.endgame_score * (MAX_PHASE - phase)) // MAX_PHASE
+
+    return score if board.turn == WHITE else -score
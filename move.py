@@ -0,0 +1,77 @@
+"""
+A class that models a chess move.
+"""
+
+from collections import namedtuple
+from utils import square_index, square_position, square_name, parse_square, PIECE_SYMBOLS
+
+
+class Move(namedtuple('Move', ['start', 'end', 'promotion'], defaults=(None,))):
+    """
+    A lightweight, immutable move.
+    It is a tuple, so it is cheap to create, compare and hash while searching through a lot of moves.
+    The promotion is the type of the piece a pawn becomes on the last row, and None for every other move.
+    """
+
+    __slots__ = ()
+
+    def __str__(self):
+        """
+        Returns a readable representation of the move.
+
+        :return: a string of the form (x, y) -> (x, y), followed by the promoted piece's symbol if there is one
+        """
+
+        if self.promotion is not None:
+            return f'{self.start} -> {self.end}={PIECE_SYMBOLS[self.promotion].upper()}'
+        return f'{self.start} -> {self.end}'
+
+    def to_int(self):
+        """
+        Packs the move into a 16-bit integer, for compact tables such as the transposition table.
+
+        :return: the start square index in the low 6 bits, followed by the end square index and, in 3 bits,
+         the promoted piece's type plus one, or 0 if it is not a promotion
+        """
+
+        promotion = 0 if self.promotion is None else self.promotion + 1
+        return square_index(self.start) | square_index(self.end) << 6 | promotion << 12
+
+    @classmethod
+    def from_int(cls, value):
+        """
+        Unpacks a move packed by to_int.
+
+        :param value: the packed move
+        :return: the Move
+        """
+
+        promotion = value >> 12 & 7
+        return cls(square_position(value & 63), square_position(value >> 6 & 63),
+                   None if promotion == 0 else promotion - 1)
+
+    def to_uci(self):
+        """
+        Writes the move in the notation of the Universal Chess Interface.
+
+        :return: the start and end squares, followed by the promoted piece's symbol if there is one, such as e2e4
+         or e7e8q
+        """
+
+        promotion = '' if self.promotion is None else PIECE_SYMBOLS[self.promotion]
+        return f'{square_name(self.start)}{square_name(self.end)}{promotion}'
+
+    @classmethod
+    def from_uci(cls, text):
+        """
+        Reads a move written in the notation of the Universal Chess Interface.
+
+        :param text: the move, such as e2e4 or e7e8q
+        :return: the Move
+        """
+
+        if len(text) not in (4, 5) or (len(text) == 5 and text[4] not in PIECE_SYMBOLS[1:5]):
+            raise ValueError(f'Invalid move: {text}')
+
+        promotion = PIECE_SYMBOLS.index(text[4]) if len(text) == 5 else None
+        return cls(parse_square(text[:2]), parse_square(text[2:4]), promotion)
@@ -0,0 +1,203 @@
+"""
+The move ordering of the search.
+
+Alpha-beta pruning cuts off the most when the best move is searched first, so the moves of every position are
+produced in stages, from the most to the least promising: the best move stored in the transposition table, the
+captures and promotions, the most valuable victims taken by the least valuable attackers leading, the killer
+moves, which are quiet moves that caused a cutoff at the same distance from the root, and the other quiet moves,
+sorted by how often they caused a cutoff anywhere in the search. The stages are generated one at a time, so if an
+earlier move causes a cutoff, the quiet moves are never generated.
+"""
+
+from evaluation import PIECE_VALUES
+from utils import PAWN, square_index
+
+# the scores that put the hash move and the captures ahead of the quiet moves when a list of moves is sorted
+HASH_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 20
+
+# the number of killer moves remembered for every ply, and the highest ply they are remembered for
+KILLER_SLOTS = 2
+MAX_PLY = 128
+
+
+def capture_score(board, move):
+    """
+    Scores a capture or promotion by the value of what it wins, then by the value of the piece that moves.
+
+    :param board: the current board
+    :param move: the Move
+    :return: the score, higher for the moves to search first
+    """
+
+    pieces = board.pieces
+    score = 0 if move.promotion is None else PIECE_VALUES[move.promotion]
+    victim = pieces[move.end[0]][move.end[1]]
+    if victim is not None:
+        attacker = pieces[move.start[0]][move.start[1]]
+        score += 10 * PIECE_VALUES[victim.piece_type] - PIECE_VALUES[attacker.piece_type]
+    elif move.start[0] != move.end[0] and pieces[move.start[0]][move.start[1]].piece_type == PAWN:
+        # an en passant capture takes a pawn with a pawn
+        score += 9 * PIECE_VALUES[PAWN]
+
+    return score
+
+
+def order_moves(board, moves, hash_move=None):
+    """
+    Sorts the moves by the hash move, then the captures by MVV-LVA, without the tables of a search.
+
+    :param board: the current board
+    :param moves: a list of Move objects
+    :param hash_move: the best move found by an earlier search of the position, or None
+    :return: the sorted list of moves
+    """
+
+    def score(move):
+        if move == hash_move:
+            return HASH_MOVE_SCORE
+        return capture_score(board, move)
+
+    moves.sort(key=score, reverse=True)
+    return moves
+
+
+class MoveOrdering:
+    """
+    The killer moves and the history table of a search, and the staged move generation that uses them.
+    """
+
+    def __init__(self):
+        """
+        Class constructor
+        """
+
+        self.killers = [[None] * KILLER_SLOTS for i in range(MAX_PLY)]
+        # a score for every start and end square of the quiet moves of each side
+        self.history = [[0] * 4096 for i in range(2)]
+
+    def new_search(self):
+        """
+        A method that forgets the killer moves, which belong to the previous position, and halves the history,
+        so the moves that were good in the previous positions are still tried early.
+
+        :return: None
+        """
+
+        for killers in self.killers:
+            for slot in range(KILLER_SLOTS):
+                killers[slot] = None
+        for history in self.history:
+            for index in range(4096):
+                history[index] >>= 1
+
+    def clear(self):
+        """
+        A method that forgets the killer moves and the history, for example when a new game starts.
+
+        :return: None
+        """
+
+        self.__init__()
+
+    def store_cutoff(self, board, move, ply, depth):
+        """
+        A method that remembers a move that caused a cutoff, if it is a quiet one.
+
+        :param board: the board the move was searched on, before it is made
+        :param move: the Move
+        :param ply: the distance of the position from the root
+        :param depth: the remaining depth of the search, deeper cutoffs count more
+        :return: None
+        """
+
+        if move.promotion is not None or board.is_capture(move):
+            return
+
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1:] = killers[:-1]
+                killers[0] = move
+
+        self.history[board.turn][square_index(move.start) * 64 + square_index(move.end)] += depth * depth
+
+    def history_score(self, color, move):
+        """
+        Looks up the history score of a quiet move.
+
+        :param color: the color of the side making the move
+        :param move: the Move
+        :return: the score, higher for the moves that caused more cutoffs
+        """
+
+        return self.history[color][square_index(move.start) * 64 + square_index(move.end)]
+
+    def sort(self, board, moves, ply, hash_move=None):
+        """
+        A method that sorts a list of moves in the order of the stages, when all of them are generated anyway,
+        such as at the root.
+
+        :param board: the current board
+        :param moves: a list of Move objects
+        :param ply: the distance of the position from the root
+        :param hash_move: the best move found by an earlier search of the position, or None
+        :return: the sorted list of moves
+        """
+
+        killers = self.killers[ply] if ply < MAX_PLY else ()
+        color = board.turn
+
+        def score(move):
+            if move == hash_move:
+                return HASH_MOVE_SCORE
+            if move.promotion is not None or board.is_capture(move):
+                return CAPTURE_SCORE + capture_score(board, move)
+            if move in killers:
+                return CAPTURE_SCORE - 1 - killers.index(move)
+            return self.history_score(color, move)
+
+        moves.sort(key=score, reverse=True)
+        return moves
+
+    def moves(self, board, ply, hash_move=None):
+        """
+        A generator of the legal moves of a position, in the order of the stages.
+        The board can be changed between two moves, as long as it is back in the same position when the next one
+        is asked for.
+
+        :param board: the current board
+        :param ply: the distance of the position from the root
+        :param hash_move: the best move found by an earlier search of the position, or None
+        :return: a generator of Move objects
+        """
+
+        restrictions = board.pins_and_checks() if board.king_positions[board.turn] is not None else None
+
+        # the hash move might come from another position with the same key, so it is checked first
+        if hash_move is not None and board.is_legal(hash_move, restrictions):
+            yield hash_move
+        else:
+            hash_move = None
+
+        captures = board.legal_moves(True, restrictions)
+        captures.sort(key=lambda move: capture_score(board, move), reverse=True)
+        for move in captures:
+            if move != hash_move:
+                yield move
+
+        killers = [killer for killer in self.killers[ply] if killer is not None] if ply < MAX_PLY else []
+        searched_killers = []
+        for killer in killers:
+            if killer != hash_move and board.pieces[killer.end[0]][killer.end[1]] is None and \
+                    board.is_legal(killer, restrictions):
+                searched_killers.append(killer)
+                yield killer
+
+        quiets = board.legal_moves(False, restrictions)
+        color = board.turn
+        history = self.history[color]
+        quiets.sort(key=lambda move: history[square_index(move.start) * 64 + square_index(move.end)], reverse=True)
+        for move in quiets:
+            if move != hash_move and move not in searched_killers:
+                yield move
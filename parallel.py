@@ -0,0 +1,203 @@
+"""
+A parallel search that splits the root moves between worker processes.
+
+Python threads can't search at the same time, so every worker is a process with its own engine and
+transposition table, which it keeps between searches. The workers receive the position packed into a few bytes
+by Board.encode, the keys of the positions it could repeat and the moves as packed integers, never as pickled
+boards.
+
+Running this module compares the speed of one worker with the speed of several:
+python parallel.py [workers] [depth]
+"""
+
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from board import Board
+from engine import Engine, INFINITY, MATE_BOUND
+from move import Move
+from ordering import order_moves
+from tablebase import Tablebases, MAX_PIECES
+
+# the engine of the worker process and the event that cancels its searches
+_engine = None
+_cancel_event = None
+
+
+def _init_worker(hash_size_mb, tablebase_directory, cancel_event):
+    """
+    Creates the engine of a worker process.
+
+    :param hash_size_mb: the memory cap of the worker's transposition table, in megabytes
+    :param tablebase_directory: the directory of the endgame tables, or None
+    :param cancel_event: the multiprocessing.Event that cancels the searches of all the workers
+    :return: None
+    """
+
+    global _engine, _cancel_event
+    _cancel_event = cancel_event
+    tablebases = Tablebases(tablebase_directory) if tablebase_directory is not None else None
+    _engine = Engine(None, hash_size_mb, tablebases=tablebases)
+
+
+def _search_moves(data, history, moves, depth, time_limit, node_limit):
+    """
+    Searches some of the root moves of a position in a worker process.
+
+    :param data: the position, packed by Board.encode
+    :param history: the keys of the positions the position could repeat, from Board.hash_history
+    :param moves: the root moves to search, packed by Move.to_int
+    :param depth: the maximum depth of the search, in plies
+    :param time_limit: the time budget in milliseconds, or None
+    :param node_limit: the node budget, or None
+    :return: a tuple consisting of the (depth, packed move, score) result of every completed depth and the number
+     of nodes searched
+    """
+
+    board = Board.decode(data)
+    board.root_hashes = list(history)
+    root_moves = [Move.from_int(move) for move in moves]
+    _engine.search(board, depth, time_limit, node_limit, _cancel_event, root_moves)
+
+    return [(depth, move.to_int(), score) for depth, move, score in _engine.iterations], _engine.nodes
+
+
+class ParallelEngine:
+    """
+    An engine that has the same search interface as Engine, but runs it on several processes.
+    """
+
+    def __init__(self, workers=None, depth=4, hash_size_mb=16, time_limit=None, node_limit=None, tablebases=None):
+        """
+        Class constructor
+        Starts the worker processes.
+
+        :param workers: the number of worker processes, or None for one per core
+        :param depth: the default maximum depth of the search, in plies, or None to only stop on a budget
+        :param hash_size_mb: the memory cap of every worker's transposition table, in megabytes
+        :param time_limit: the default time budget of a search, in milliseconds, or None
+        :param node_limit: the default node budget of every worker, or None
+        :param tablebases: the Tablebases the positions with few pieces are looked up in, or None, which every worker
+         opens for itself
+        """
+
+        self.workers = workers or os.cpu_count()
+        self.depth = depth
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.nodes = 0
+        self.completed_depth = 0
+        self.tablebases = tablebases
+        directory = tablebases.directory if tablebases is not None else None
+        # the workers check the event while they search, so a cancelled search really stops them
+        self.cancel_event = multiprocessing.Event()
+        self.executor = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                            initargs=(hash_size_mb, directory, self.cancel_event))
+
+    def search(self, board, depth=None, time_limit=None, node_limit=None, stop_event=None):
+        """
+        A method that searches the position, dealing out its moves to the workers.
+        The results are merged at the deepest depth completed by every worker, so the scores are comparable, except
+        for the workers that found a mate score, which is final and ends their search early.
+
+        :param board: the current board, which is left unchanged
+        :param depth: the maximum depth of the search in plies, or None for the default one
+        :param time_limit: the time budget in milliseconds, or None for the default one
+        :param node_limit: the node budget of every worker, or None for the default one
+        :param stop_event: a threading.Event that cancels the search when it is set, or None
+        :return: a tuple consisting of the best Move, or None if there are no moves, and its score
+        """
+
+        depth = depth or self.depth or 64
+        time_limit = time_limit or self.time_limit
+        node_limit = node_limit or self.node_limit
+        self.nodes = 0
+        self.completed_depth = 0
+
+        if self.tablebases is not None and board.piece_count <= MAX_PIECES:
+            found = self.tablebases.best_move(board)
+            if found is not None:
+                move, (outcome, plies) = found
+                return move, Engine.tablebase_score(outcome, plies, 0)
+
+        moves = order_moves(board, board.legal_moves())
+        if not moves:
+            return None, 0
+
+        # deals the moves out like cards, so every worker gets some of the promising ones
+        self.cancel_event.clear()
+        data = board.encode()
+        history = board.hash_history()
+        chunks = [moves[i::self.workers] for i in range(min(self.workers, len(moves)))]
+        futures = [self.executor.submit(_search_moves, data, history, [move.to_int() for move in chunk], depth,
+                                        time_limit, node_limit) for chunk in chunks]
+
+        # waits in short steps, so a cancelled search stops the workers right away, and returns once they stopped
+        pending = set(futures)
+        while pending:
+            if stop_event is not None and stop_event.is_set():
+                self.cancel_event.set()
+                for future in pending:
+                    future.cancel()
+                wait(pending)
+                return None, 0
+            done, pending = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+
+        results = [future.result() for future in futures]
+        self.nodes = sum(nodes for iterations, nodes in results)
+        # a worker whose moves all mate or get mated stops deepening, so it doesn't hold the others back
+        last_iterations = [iterations[-1] for iterations, nodes in results if iterations]
+        open_depths = [last_depth for last_depth, move, score in last_iterations if -MATE_BOUND <= score <= MATE_BOUND]
+        self.completed_depth = min(open_depths) if open_depths else max(last_iterations)[0]
+
+        # every worker is compared at the completed depth, or at the depth its mate was found
+        best_move, best_score = None, -INFINITY
+        for iterations, nodes in results:
+            compared = [iteration for iteration in iterations if iteration[0] <= self.completed_depth]
+            if compared and compared[-1][2] > best_score:
+                best_move, best_score = Move.from_int(compared[-1][1]), compared[-1][2]
+
+        return best_move, best_score
+
+    def close(self):
+        """
+        A method that stops the worker processes.
+
+        :return: None
+        """
+
+        self.executor.shutdown(cancel_futures=True)
+
+
+def benchmark(workers, depth):
+    """
+    Searches the starting position with one worker and with several, and reports the speedup.
+
+    :param workers: the number of workers to compare with a single one
+    :param depth: the depth of the search, in plies
+    :return: None
+    """
+
+    board = Board()
+    timings = []
+    for count in (1, workers):
+        engine = ParallelEngine(count, depth)
+
+        # the first search only warms the workers up
+        engine.search(board, 1)
+        start = time.perf_counter()
+        move, score = engine.search(board)
+        elapsed = time.perf_counter() - start
+        engine.close()
+
+        timings.append(elapsed)
+        print(f'workers={count} depth={engine.completed_depth} move={move} score={score} nodes={engine.nodes} '
+              f'time={elapsed:.2f}s nps={engine.nodes / elapsed:.0f}')
+
+    print(f'speedup: {timings[0] / timings[1]:.2f}x')
+
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count(), int(sys.argv[2]) if len(sys.argv) > 2 else 4)
@@ -0,0 +1,90 @@
+"""
+The perft benchmark and correctness suite of the move generation.
+
+It counts the leaf nodes of the legal move tree of reference positions, which cover castling, en passant,
+promotions, checks and pins, compares them with the known counts and
+reports the speed of every board backend in nodes per second. Any change to the pieces or the board should
+keep every count correct and is measured with the same suite:
+python perft.py [max depth]
+
+The count of every move of the starting position can be printed instead, to narrow down a wrong count:
+python perft.py divide <depth>
+"""
+
+import sys
+import time
+from bitboard import BitboardBoard
+from board import Board, STARTING_FEN
+
+BACKENDS = (Board, BitboardBoard)
+
+# the name, the FEN string and the known node count of every depth
+POSITIONS = (
+    ('start', STARTING_FEN, {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609}),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+     {1: 48, 2: 2039, 3: 97862, 4: 4085603}),
+    ('endgame', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1', {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624}),
+    ('promotion', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+     {1: 6, 2: 264, 3: 9467, 4: 422333}),
+    ('talkchess', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8', {1: 44, 2: 1486, 3: 62379, 4: 2103487}),
+    ('middlegame', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+     {1: 46, 2: 2079, 3: 89890, 4: 3894594}),
+)
+
+
+def run_suite(max_depth):
+    """
+    Runs every reference position up to a depth, with every backend.
+
+    :param max_depth: the maximum depth, in plies
+    :return: True if every count was correct, False otherwise
+    """
+
+    correct = True
+    for backend in BACKENDS:
+        total_nodes = 0
+        total_time = 0.0
+
+        for name, fen, counts in POSITIONS:
+            board = backend.from_fen(fen)
+            for depth, expected in sorted(counts.items()):
+                if depth > max_depth:
+                    break
+
+                start = time.perf_counter()
+                nodes = board.perft(depth)
+                elapsed = time.perf_counter() - start
+                total_nodes += nodes
+                total_time += elapsed
+
+                status = 'ok' if nodes == expected else f'WRONG, expected {expected}'
+                correct = correct and nodes == expected
+                print(f'{backend.__name__:<14} {name:<10} depth {depth}: {nodes:>10} nodes {elapsed:8.3f}s '
+                      f'{nodes / max(elapsed, 1e-9):>10.0f} nps  {status}')
+
+        print(f'{backend.__name__:<14} total: {total_nodes} nodes in {total_time:.3f}s, '
+              f'{total_nodes / max(total_time, 1e-9):.0f} nps\n')
+
+    return correct
+
+
+def divide(depth):
+    """
+    Prints the perft count of every move of the starting position.
+
+    :param depth: the depth, in plies
+    :return: None
+    """
+
+    board = Board()
+    counts = board.divide(depth)
+    for move, nodes in sorted(counts.items()):
+        print(f'{move}: {nodes}')
+    print(f'total: {sum(counts.values())}')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == 'divide':
+        divide(int(sys.argv[2]))
+    else:
+        exit(0 if run_suite(int(sys.argv[1]) if len(sys.argv) > 1 else 3) else 1)
@@ -0,0 +1,400 @@
+"""
+Reading and writing games in Portable Game Notation.
+
+The reader streams the file one line at a time and yields the games one by one, and the moves of each game one by
+one, so archives of any size are processed in constant memory. Every move in Standard Algebraic Notation is
+resolved against the move generator of the board, which plays the game along.
+
+Running this module replays every game of a file and reports the speed:
+python pgn.py <PGN file>
+"""
+
+import re
+import sys
+import time
+from board import Board
+from utils import *
+
+HEADER_PATTERN = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+TOKEN_PATTERN = re.compile(r'1-0|0-1|1/2-1/2|\*|\d+\.+|\$\d+|[{}();]|[^\s{}();]+')
+SAN_PATTERN = re.compile(r'^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$')
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+
+HEADER, MOVE, RESULT = range(3)
+
+# the tags every game has, in the order they are written
+SEVEN_TAG_ROSTER = ('Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result')
+
+
+def parse_san(board, san):
+    """
+    Finds the move of the side to move that is written in Standard Algebraic Notation.
+
+    :param board: the current board
+    :param san: the move, such as e4, Nbd7, exd5, e8=Q or O-O
+    :return: the matching Move
+    """
+
+    san = san.rstrip('+#!?')
+    moves = board.legal_moves()
+
+    # castling is written as the king's move, two squares to the side
+    if san in ('O-O', 'O-O-O', '0-0', '0-0-0'):
+        row = 0 if board.turn == WHITE else 7
+        end = (6 if san in ('O-O', '0-0') else 2, row)
+        for move in moves:
+            if move.start == (4, row) and move.end == end and board.pieces[4][row].piece_type == KING:
+                return move
+        raise ValueError(f'Illegal move: {san}')
+
+    match = SAN_PATTERN.match(san)
+    if match is None:
+        raise ValueError(f'Invalid move: {san}')
+    symbol, column, row, end, promotion = match.groups()
+
+    piece_type = PIECE_SYMBOLS.index(symbol.lower()) if symbol else PAWN
+    promotion = PIECE_SYMBOLS.index(promotion.lower()) if promotion else None
+    end = parse_square(end)
+    candidates = [move for move in moves
+                  if move.end == end and move.promotion == promotion and
+                  board.pieces[move.start[0]][move.start[1]].piece_type == piece_type and
+                  (column is None or move.start[0] == 'abcdefgh'.index(column)) and
+                  (row is None or move.start[1] == int(row) - 1)]
+
+    if not candidates:
+        raise ValueError(f'Illegal move: {san}')
+    if len(candidates) > 1:
+        raise ValueError(f'Ambiguous move: {san}')
+
+    return candidates[0]
+
+
+def move_to_san(board, move):
+    """
+    Writes a move of the side to move in Standard Algebraic Notation.
+
+    :param board: the board before the move
+    :param move: the Move
+    :return: the move, such as e4, Nbd7, exd5, e8=Q+ or O-O, with + for a check and # for a checkmate
+    """
+
+    start, end, promotion = move
+    piece = board.pieces[start[0]][start[1]]
+    # a pawn moving diagonally always captures, even if it is en passant
+    capture = board.pieces[end[0]][end[1]] is not None or (piece.piece_type == PAWN and start[0] != end[0])
+
+    if piece.piece_type == KING and end[0] - start[0] in (2, -2):
+        san = 'O-O' if end[0] > start[0] else 'O-O-O'
+    elif piece.piece_type == PAWN:
+        san = f"{'abcdefgh'[start[0]]}x{square_name(end)}" if capture else square_name(end)
+        if promotion is not None:
+            san += f'={PIECE_SYMBOLS[promotion].upper()}'
+    else:
+        # names the starting column or row if another piece of the same type can move to the same square
+        others = [other.start for other in board.legal_moves()
+                  if other.end == end and other.start != start and
+                  board.pieces[other.start[0]][other.start[1]].piece_type == piece.piece_type]
+        disambiguation = ''
+        if others:
+            if all(other[0] != start[0] for other in others):
+                disambiguation = 'abcdefgh'[start[0]]
+            elif all(other[1] != start[1] for other in others):
+                disambiguation = str(start[1] + 1)
+            else:
+                disambiguation = square_name(start)
+        san = f"{PIECE_SYMBOLS[piece.piece_type].upper()}{disambiguation}{'x' if capture else ''}{square_name(end)}"
+
+    board.push(move)
+    if board.is_check():
+        san += '+' if board.legal_moves() else '#'
+    board.pop()
+
+    return san
+
+
+class PGNGame:
+    """
+    A game that is being read. Its moves are read from the file while they are iterated.
+    """
+
+    def __init__(self, reader, headers):
+        """
+        Class constructor
+        Sets up the starting position of the game, which is given by the FEN tag if there is one.
+
+        :param reader: the reader the game comes from
+        :param headers: a dictionary of the tags of the game
+        """
+
+        self.reader = reader
+        self.headers = headers
+        self.result = headers.get('Result', '*')
+        self.board = Board.from_fen(headers['FEN']) if 'FEN' in headers else Board()
+        self.finished = False
+
+    def moves(self):
+        """
+        A generator that reads the moves of the game and plays them on the board.
+
+        :return: a generator of the Moves of the game
+        """
+
+        while not self.finished:
+            token = self.reader.next_token()
+            if token is None:
+                self.finished = True
+            elif token[0] == HEADER:
+                # the next game started without a result
+                self.reader.push_back(token)
+                self.finished = True
+            elif token[0] == RESULT:
+                self.result = token[1]
+                self.finished = True
+            else:
+                move = parse_san(self.board, token[1])
+                self.board.push(move)
+                yield move
+
+    def skip(self):
+        """
+        A method that reads the rest of the game without playing its moves.
+
+        :return: None
+        """
+
+        while not self.finished:
+            token = self.reader.next_token()
+            if token is None:
+                self.finished = True
+            elif token[0] == HEADER:
+                self.reader.push_back(token)
+                self.finished = True
+            elif token[0] == RESULT:
+                self.result = token[1]
+                self.finished = True
+
+
+class PGNReader:
+    """
+    A streaming reader of a PGN file, which only holds the current line and game in memory.
+    """
+
+    def __init__(self, stream):
+        """
+        Class constructor
+
+        :param stream: a text stream, such as an open file
+        """
+
+        self.tokens = self.tokenize(stream)
+        self.pushed_back = None
+        self.game = None
+
+    def tokenize(self, stream):
+        """
+        A generator that splits the file into tags, moves and results, leaving out the move numbers, comments,
+        annotations and variations.
+
+        :param stream: a text stream
+        :return: a generator of (HEADER, name, value), (MOVE, san) and (RESULT, result) tuples
+        """
+
+        in_comment = False
+        variation_depth = 0
+
+        for line in stream:
+            # lines starting with % are escaped
+            if line.startswith('%'):
+                continue
+
+            if not in_comment and variation_depth == 0 and line.lstrip().startswith('['):
+                match = HEADER_PATTERN.match(line.strip())
+                if match is not None:
+                    yield HEADER, match.group(1), match.group(2).replace('\\"', '"')
+                continue
+
+            for token in TOKEN_PATTERN.findall(line):
+                if in_comment:
+                    if token == '}':
+                        in_comment = False
+                elif token == '{':
+                    in_comment = True
+                elif token == ';':
+                    break
+                elif token == '(':
+                    variation_depth += 1
+                elif token == ')':
+                    variation_depth -= 1
+                elif variation_depth > 0 or token[0] == '$' or token[-1] == '.':
+                    continue
+                elif token in RESULTS:
+                    yield RESULT, token
+                else:
+                    yield MOVE, token
+
+    def next_token(self):
+        """
+        Reads the next token of the file.
+
+        :return: the token, or None at the end of the file
+        """
+
+        if self.pushed_back is not None:
+            token, self.pushed_back = self.pushed_back, None
+            return token
+
+        return next(self.tokens, None)
+
+    def push_back(self, token):
+        """
+        Puts a token back, so it is read again by next_token.
+
+        :param token: the token
+        :return: None
+        """
+
+        self.pushed_back = token
+
+    def __iter__(self):
+        """
+        A generator of the games of the file. Whatever is left of the previous game is skipped when the next one
+        is read.
+
+        :return: a generator of PGNGame objects
+        """
+
+        while True:
+            if self.game is not None:
+                self.game.skip()
+
+            token = self.next_token()
+            if token is None:
+                return
+
+            headers = {}
+            while token is not None and token[0] == HEADER:
+                headers[token[1]] = token[2]
+                token = self.next_token()
+            if token is not None:
+                self.push_back(token)
+
+            self.game = PGNGame(self, headers)
+            yield self.game
+
+
+def read_games(stream):
+    """
+    Reads the games of a PGN file one by one.
+
+    :param stream: a text stream, such as an open file
+    :return: a generator of PGNGame objects
+    """
+
+    return iter(PGNReader(stream))
+
+
+class PGNWriter:
+    """
+    A writer that appends games to a PGN file.
+    """
+
+    def __init__(self, stream, line_length=80):
+        """
+        Class constructor
+
+        :param stream: a text stream, such as a file open for appending
+        :param line_length: the maximum length of the lines of the moves
+        """
+
+        self.stream = stream
+        self.line_length = line_length
+
+    def write_game(self, moves, headers=None, fen=None):
+        """
+        A method that writes a game.
+
+        :param moves: the Moves of the game
+        :param headers: a dictionary of tags, the seven tag roster is completed with unknown values
+        :param fen: the starting position of the game, or None for the usual one
+        :return: None
+        """
+
+        headers = dict(headers or {})
+        for tag in SEVEN_TAG_ROSTER:
+            headers.setdefault(tag, '*' if tag == 'Result' else '?')
+        if fen is not None:
+            headers['SetUp'] = '1'
+            headers['FEN'] = fen
+
+        tags = [tag for tag in SEVEN_TAG_ROSTER] + [tag for tag in headers if tag not in SEVEN_TAG_ROSTER]
+        for tag in tags:
+            value = str(headers[tag]).replace('\\', '\\\\').replace('"', '\\"')
+            self.stream.write(f'[{tag} "{value}"]\n')
+        self.stream.write('\n')
+
+        # writes the moves with their numbers, wrapping the lines
+        board = Board.from_fen(fen) if fen is not None else Board()
+        tokens = []
+        for move in moves:
+            if board.turn == WHITE:
+                tokens.append(f'{board.fullmove_number}.')
+            elif not tokens:
+                tokens.append(f'{board.fullmove_number}...')
+            tokens.append(move_to_san(board, move))
+            board.push(move)
+        tokens.append(headers['Result'])
+
+        line = ''
+        for token in tokens:
+            if line and len(line) + 1 + len(token) > self.line_length:
+                self.stream.write(line + '\n')
+                line = token
+            else:
+                line = f'{line} {token}' if line else token
+        self.stream.write(line + '\n\n')
+        self.stream.flush()
+
+    def write_board(self, board, headers=None, fen=None):
+        """
+        A method that writes the game played on a board, from the moves on its move stack.
+
+        :param board: the board
+        :param headers: a dictionary of tags
+        :param fen: the position the game started from, or None for the usual one
+        :return: None
+        """
+
+        self.write_game([record.move for record in board.move_stack], headers, fen)
+
+
+def replay(path):
+    """
+    Replays every game of a PGN file and reports the number of games and moves and the speed.
+
+    :param path: the path of the file
+    :return: None
+    """
+
+    games = moves = errors = 0
+    start = time.perf_counter()
+
+    with open(path, encoding='utf-8', errors='replace') as stream:
+        for game in read_games(stream):
+            games += 1
+            try:
+                for move in game.moves():
+                    moves += 1
+            except ValueError as error:
+                errors += 1
+                print(f'game {games}: {error}')
+
+    elapsed = time.perf_counter() - start
+    print(f'{games} games, {moves} moves, {errors} errors in {elapsed:.2f}s, {moves / max(elapsed, 1e-9):.0f} moves/s')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print(f'Usage: python {sys.argv[0]} <PGN file>')
+        exit(1)
+
+    replay(sys.argv[1])
@@ -2,38 +2,69 @@
 Classes that model the chess pieces.
 
 Each class is derived from BasePiece, which is a basic implementation of a piece.
-The characteristics of a piece include the color, the image path, the move set and the position.
-Each piece's class also has a method that validates a given move according to classic chess rules.
+The characteristics of a piece include the color, the move set and the position.
+The legality of a move is decided by the Board, which knows about checks, castling, en passant and promotions.
+The pieces know nothing about how they are drawn, so they can be used without pygame.
+
+A piece only holds its color, its position and the board it is on, in slots. The move sets are frozensets of
+offsets built once per type and color and shared by all the pieces, so creating a piece allocates nothing else and
+checking an offset takes constant time.
 """
 
-from abc import abstractmethod
-import pygame
 from utils import *
 
 
+def build_move_set(directions, sliding):
+    """
+    Builds the offsets a piece can move by.
+
+    :param directions: the (x, y) directions the piece moves in
+    :param sliding: True if the piece slides along its directions for more than one square
+    :return: a frozenset of (x, y) offsets
+    """
+
+    steps = range(1, 8) if sliding else (1,)
+    return frozenset((dx * step, dy * step) for dx, dy in directions for step in steps)
+
+
 class BasePiece:
     """
     A basic implementation of an abstract piece class.
     """
 
-    def __init__(self, color, move_set, position, board):
+    __slots__ = ('color', 'position', 'board')
+
+    # the type of the piece, the directions it moves in and whether it can slide along them for more than one square
+    piece_type = None
+    directions = ()
+    sliding = False
+    # the move set of each color, indexed by color
+    move_sets = (frozenset(), frozenset())
+
+    def __init__(self, color, position, board):
         """
         Class constructor
 
         :param color: the color of the piece, which can be either white or black
-        :param move_set: a tuple array. Each tuple is the difference between the current coordinates and the end
-         coordinates of a possible move
         :param position: a tuple containing the current position
         :param board: the board it is currently on
         """
 
         self.color = color
-        self.img_path = f"assets/{'white' if color == WHITE else 'black'}-{self.__class__.__name__.lower()}.png"
-        self.image = pygame.image.load(self.img_path)
-        self.move_set = move_set
         self.position = position
         self.board = board
 
+    @property
+    def move_set(self):
+        """
+        The move set of the piece, shared with the other pieces of its type and color.
+
+        :return: a frozenset of tuples, each of them the difference between the current coordinates and the end
+         coordinates of a possible move
+        """
+
+        return self.move_sets[self.color]
+
     @staticmethod
     def is_on_board(position):
         """
@@ -51,116 +82,39 @@ class BasePiece:
 
         return True
 
-    def basic_validate(self, new_position, x, y):
+    def get_moves(self):
         """
-        Basic validation for the attempted move
+        Generates every pseudo-legal end position of the piece.
+        It walks each direction outward from the current position and stops at the first blocker,
+        which it includes if it is an enemy piece.
 
-        :param new_position: the position it is trying to move to
-        :param x: x coordinate of the current position
-        :param y: y coordinate of the current position
-        :return: False, if the attempted move is invalid, True otherwise
+        :return: a list of tuples consisting of the positions the piece can move to
         """
 
-        # checks if piece is on board
-        if not self.is_on_board(new_position):
-            return False
+        moves = []
+        board = self.board
+        x, y = self.position
+        max_steps = 8 if self.sliding else 2
 
-        # checks if the next move is part of the piece's possible moves
-        if (x, y) not in self.move_set:
-            return False
+        for dx, dy in self.directions:
+            new_x, new_y = x + dx, y + dy
+            steps = 1
 
-        # checks if the ending position is not empty and of the opposite color
-        if self.board[new_position[0]][new_position[1]] is not None and \
-                self.board[new_position[0]][new_position[1]].color == self.color:
-            return False
+            # walks the ray until it leaves the board, reaches a blocker or runs out of steps
+            while 0 <= new_x < 8 and 0 <= new_y < 8 and steps < max_steps:
+                target = board[new_x][new_y]
+                if target is None:
+                    moves.append((new_x, new_y))
+                else:
+                    if target.color != self.color:
+                        moves.append((new_x, new_y))
+                    break
 
-        return True
-
-    def validate_horizontally(self, new_position):
-        """
-        Validates a horizontal move attempt
-
-        :param new_position: the position it is trying to move to
-        :return: False, if the attempted move is invalid, True otherwise
-        """
+                new_x += dx
+                new_y += dy
+                steps += 1
 
-        # if the move is not horizontal
-        if self.position[1] != new_position[1]:
-            return False
-
-        # checks if there are no other pieces placed between the starting and ending position
-        for i in range(min(self.position[0], new_position[0]) + 1, max(self.position[0], new_position[0])):
-            if self.board[i][self.position[1]] is not None:
-                return False
-
-        return True
-
-    def validate_vertically(self, new_position):
-        """
-        Validates a vertical move attempt
-
-        :param new_position: the position it is trying to move to
-        :return: False, if the attempted move is invalid, True otherwise
-        """
-
-        # if the move is not vertical
-        if self.position[0] != new_position[0]:
-            return False
-
-        # checks if there are no other pieces placed between the starting and ending position
-        for i in range(min(self.position[1], new_position[1]) + 1, max(self.position[1], new_position[1])):
-            if self.board[self.position[0]][i] is not None:
-                return False
-
-        return True
-
-    def validate_diagonally(self, new_position, x, y):
-        """
-        Validates a diagonal  move attempt
-
-        :param new_position: the position it is trying to move to
-        :param x: x coordinate of the current position
-        :param y: y coordinate of the current position
-        :return: False, if the attempted move is invalid, True otherwise
-        """
-
-        # if the move is not diagonal
-        if self.position[0] == new_position[0] or self.position[1] == new_position[1]:
-            return False
-
-        sign_x = x // (abs(x))
-        sign_y = y // (abs(y))
-
-        # checks if there are no other pieces placed between the starting and ending position
-        for i, j in zip(range(self.position[0] + sign_x, new_position[0], sign_x),
-                        range(self.position[1] + sign_y, new_position[1], sign_y)):
-            if self.board[i][j] is not None:
-                return False
-
-        return True
-
-    @abstractmethod
-    def validate_move(self, new_position):
-        """
-        Abstract method that will be overwritten in order to validate each piece's move set according to chess rules
-
-        :param new_position: the position it is trying to move to
-        :return: False, if the attempted move is invalid, True otherwise
-        """
-
-        raise NotImplementedError
-
-    def draw(self, window):
-        """
-        Method that draws the piece on the board
-
-        :param window: the window where it will be drawn
-        :return: None
-        """
-
-        x = self.position[0] * SQUARE_SIZE
-        y = HEIGHT - (self.position[1] + 1) * SQUARE_SIZE
-        window.blit(self.image, (x, y))
+        return moves
 
 
 class Pawn(BasePiece):
@@ -168,56 +122,39 @@ class Pawn(BasePiece):
     A class that extends the BasicPiece class. It is meant to model the behaviour of a chess pawn.
     """
 
-    # hardcoded move set that is dependant on color
-    def __init__(self, color, position, board):
-        """
-        Class constructor
-        Extends the BasicPiece constructor. It initializes the move set with a hardcoded array.
-
-        :param color: the color of the piece, which can be either white or black
-        :param position: a tuple containing the current position
-        :param board: the board it is currently on
-        """
+    __slots__ = ()
 
-        if color == WHITE:
-            move_set = [(0, 1), (1, 1), (-1, 1), (0, 2)]
-        else:
-            move_set = [(0, -1), (-1, -1), (1, -1), (0, -2)]
-        super().__init__(color, move_set, position, board)
+    piece_type = PAWN
+    # hardcoded move sets that are dependant on color
+    move_sets = (frozenset(((0, -1), (-1, -1), (1, -1), (0, -2))), frozenset(((0, 1), (1, 1), (-1, 1), (0, 2))))
 
-    def validate_move(self, new_position):
+    def get_moves(self):
         """
-        Overrides the BasicPiece method. Calls the basic_validate method. Has its' own set of extra custom checks.
+        Overrides the BasicPiece method, since pawns move and capture in different directions.
 
-        :param new_position: the position it is trying to move to
-        :return: False, if the attempted move is invalid, True otherwise
+        :return: a list of tuples consisting of the positions the pawn can move to
         """
 
-        (x, y) = (new_position[0] - self.position[0], new_position[1] - self.position[1])
-        if not self.basic_validate(new_position, x, y):
-            return False
+        moves = []
+        board = self.board
+        x, y = self.position
+        step = 1 if self.color == WHITE else -1
+        start_row = 1 if self.color == WHITE else 6
 
-        # if the pawn tries to capture vertically
-        if ((x, y) == (0, 1) or (x, y) == (0, -1)) and self.board[new_position[0]][new_position[1]] is not None:
-            return False
+        # moves forward one square, or two squares from the starting position, if the path is empty
+        if 0 <= y + step < 8 and board[x][y + step] is None:
+            moves.append((x, y + step))
+            if y == start_row and board[x][y + 2 * step] is None:
+                moves.append((x, y + 2 * step))
 
-        # checks if it's moving diagonally to capture a piece
-        if x != 0 and y != 0:
-            if self.board[new_position[0]][new_position[1]] is not None and \
-                    self.board[new_position[0]][new_position[1]].color == self.color or \
-                    self.board[new_position[0]][new_position[1]] is None:
-                return False
-
-        # checks if it's in its' starting position in order to move two squares
-        if y == 2 or y == -2:
-            if not self.validate_vertically(new_position):
-                return False
-            if self.color == WHITE and self.position[1] != 1:
-                return False
-            elif self.color == BLACK and self.position[1] != 6:
-                return False
+        # captures diagonally
+        for new_x in (x - 1, x + 1):
+            if 0 <= new_x < 8 and 0 <= y + step < 8:
+                target = board[new_x][y + step]
+                if target is not None and target.color != self.color:
+                    moves.append((new_x, y + step))
 
-        return True
+        return moves
 
 
 class Rook(BasePiece):
@@ -225,38 +162,12 @@ class Rook(BasePiece):
         A class that extends the BasicPiece class. It is meant to model the behaviour of a chess rook.
     """
 
-    def __init__(self, color, position, board):
-        """
-        Class constructor
-        Extends the BasicPiece constructor. It initializes the move set with a generated array.
+    __slots__ = ()
 
-        :param color: the color of the piece, which can be either white or black
-        :param position: a tuple containing the current position
-        :param board: the board it is currently on
-        """
-
-        move_set = []
-        for i in range(1, 8):
-            move_set.extend([(i, 0), (-i, 0), (0, i), (0, -i)])
-        super().__init__(color, move_set, position, board)
-
-    def validate_move(self, new_position):
-        """
-        Overrides the BasicPiece method. Uses the validate_vertically and validate_horizontally methods from BasicPiece.
-
-        :param new_position: the position it is trying to move to
-        :return: False, if the attempted move is invalid, True otherwise
-        """
-
-        (x, y) = (new_position[0] - self.position[0], new_position[1] - self.position[1])
-        if not self.basic_validate(new_position, x, y):
-            return False
-
-        # vertical and horizontal validation
-        if not self.validate_vertically(new_position) and not self.validate_horizontally(new_position):
-            return False
-
-        return True
+    piece_type = ROOK
+    directions = ((1, 0), (-1, 0), (0, 1), (0, -1))
+    sliding = True
+    move_sets = (build_move_set(directions, sliding),) * 2
 
 
 class Bishop(BasePiece):
@@ -264,38 +175,12 @@ class Bishop(BasePiece):
         A class that extends the BasicPiece class. It is meant to model the behaviour of a chess bishop.
         """
 
-    def __init__(self, color, position, board):
-        """
-        Class constructor
-        Extends the BasicPiece constructor. It initializes the move set with a generated array.
-
-        :param color: the color of the piece, which can be either white or black
-        :param position: a tuple containing the current position
-        :param board: the board it is currently on
-        """
-
-        move_set = []
-        for i in range(1, 8):
-            move_set.extend([(i, i), (-i, i), (-i, -i), (i, -i)])
-        super().__init__(color, move_set, position, board)
+    __slots__ = ()
 
-    def validate_move(self, new_position):
-        """
-        Overrides the BasicPiece method. Uses the validate_diagonally method from BasicPiece.
-
-        :param new_position: the position it is trying to move to
-        :return: False, if the attempted move is invalid, True otherwise
-        """
-
-        (x, y) = (new_position[0] - self.position[0], new_position[1] - self.position[1])
-        if not self.basic_validate(new_position, x, y):
-            return False
-
-        # diagonal validation
-        if not self.validate_diagonally(new_position, x, y):
-            return False
-
-        return True
+    piece_type = BISHOP
+    directions = ((1, 1), (-1, 1), (-1, -1), (1, -1))
+    sliding = True
+    move_sets = (build_move_set(directions, sliding),) * 2
 
 
 class Knight(BasePiece):
@@ -303,33 +188,11 @@ class Knight(BasePiece):
      A class that extends the BasicPiece class. It is meant to model the behaviour of a chess knight.
     """
 
-    def __init__(self, color, position, board):
-        """
-        Class constructor
-        Extends the BasicPiece constructor. It initializes the move set with a hardcoded array.
-
-        :param color: the color of the piece, which can be either white or black
-        :param position: a tuple containing the current position
-        :param board: the board it is currently on
-        """
-
-        # hardcoded move set
-        move_set = [(-1, 2), (1, 2), (-2, 1), (2, 1), (-2, -1), (2, -1), (-1, -2), (1, -2)]
-        super().__init__(color, move_set, position, board)
-
-    def validate_move(self, new_position):
-        """
-        Overrides the BasicPiece method. Calls the basic_validate method. Has its' own set of extra custom checks.
-
-        :param new_position: the position it is trying to move to
-        :return: False, if the attempted move is invalid, True otherwise
-        """
-
-        (x, y) = (new_position[0] - self.position[0], new_position[1] - self.position[1])
-        if not self.basic_validate(new_position, x, y):
-            return False
+    __slots__ = ()
 
-        return True
+    piece_type = KNIGHT
+    directions = ((-1, 2), (1, 2), (-2, 1), (2, 1), (-2, -1), (2, -1), (-1, -2), (1, -2))
+    move_sets = (build_move_set(directions, False),) * 2
 
 
 class Queen(BasePiece):
@@ -337,41 +200,12 @@ class Queen(BasePiece):
     A class that extends the BasicPiece class. It is meant to model the behaviour of a chess queen.
     """
 
-    def __init__(self, color, position, board):
-        """
-        Class constructor
-        Extends the BasicPiece constructor. It initializes the move set with a generated array.
-
-        :param color: the color of the piece, which can be either white or black
-        :param position: a tuple containing the current position
-        :param board: the board it is currently on
-        """
-
-        move_set = []
-        for i in range(1, 8):
-            move_set.extend([(i, 0), (-i, 0), (0, i), (0, -i), (i, i), (-i, i), (-i, -i), (i, -i)])
-        super().__init__(color, move_set, position, board)
-
-    def validate_move(self, new_position):
-        """
-        Overrides the BasicPiece method. Uses the validate_vertically, validate_horizontally  and validate_diagonally
-        methods from BasicPiece.
-
-        :param new_position: the position it is trying to move to
-        :return: False, if the attempted move is invalid, True otherwise
-        """
-
-        (x, y) = (new_position[0] - self.position[0], new_position[1] - self.position[1])
-        if not self.basic_validate(new_position, x, y):
-            return False
+    __slots__ = ()
 
-        # horizontal, vertical and diagonal validation
-        if not self.validate_horizontally(new_position) and \
-                not self.validate_vertically(new_position) and \
-                not self.validate_diagonally(new_position, x, y):
-            return False
-
-        return True
+    piece_type = QUEEN
+    directions = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (-1, 1), (-1, -1), (1, -1))
+    sliding = True
+    move_sets = (build_move_set(directions, sliding),) * 2
 
 
 class King(BasePiece):
@@ -379,29 +213,12 @@ class King(BasePiece):
     A class that extends the BasicPiece class. It is meant to model the behaviour of a chess king.
     """
 
-    def __init__(self, color, position, board):
-        """
-        Class constructor
-        Extends the BasicPiece constructor. It initializes the move set with a hardcoded array.
+    __slots__ = ()
 
-        :param color: the color of the piece, which can be either white or black
-        :param position: a tuple containing the current position
-        :param board: the board it is currently on
-        """
+    piece_type = KING
+    directions = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (-1, 1), (1, -1), (-1, -1))
+    move_sets = (build_move_set(directions, False),) * 2
 
-        move_set = [(1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (-1, 1), (1, -1), (-1, -1)]
-        super().__init__(color, move_set, position, board)
 
-    def validate_move(self, new_position):
-        """
-        Overrides the BasicPiece method. Calls the basic_validate method.
-
-        :param new_position: the position it is trying to move to
-        :return: False, if the attempted move is invalid, True otherwise
-        """
-
-        (x, y) = (new_position[0] - self.position[0], new_position[1] - self.position[1])
-        if not self.basic_validate(new_position, x, y):
-            return False
-
-        return True
+# the piece classes, indexed by their piece type
+PIECE_CLASSES = (Pawn, Knight, Bishop, Rook, Queen, King)
@@ -0,0 +1,137 @@
+"""
+A class that draws the board and its pieces with pygame.
+It is the only part of the game, besides the main loop, that needs pygame.
+
+The piece images are kept in a cache shared by the whole process, so every file is read from disk only once.
+"""
+
+import os
+import pygame
+from utils import *
+
+ASSETS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+PIECE_NAMES = ('pawn', 'knight', 'bishop', 'rook', 'queen', 'king')
+
+# the loaded images, keyed by color and piece type
+_sprites = {}
+
+
+def get_sprite(color, piece_type):
+    """
+    Returns the image of a piece, loading it the first time it is asked for.
+    It is scaled to the size of a square and, once the window exists, converted to its pixel format,
+    so blitting it is as fast as possible.
+
+    :param color: the color of the piece
+    :param piece_type: the type of the piece
+    :return: the pygame Surface of the image
+    """
+
+    sprite = _sprites.get((color, piece_type))
+    if sprite is None:
+        file_name = f"{'white' if color == WHITE else 'black'}-{PIECE_NAMES[piece_type]}.png"
+        path = os.path.join(ASSETS_DIRECTORY, file_name)
+        sprite = pygame.image.load(path)
+        if sprite.get_size() != (SQUARE_SIZE, SQUARE_SIZE):
+            sprite = pygame.transform.smoothscale(sprite, (SQUARE_SIZE, SQUARE_SIZE))
+
+        # converting needs a display, so the image is only cached once it could be converted
+        if pygame.display.get_surface() is None:
+            return sprite
+        sprite = sprite.convert_alpha()
+        _sprites[color, piece_type] = sprite
+
+    return sprite
+
+
+class Renderer:
+    """
+    The implementation of the pygame renderer.
+    It remembers what it drew on every square, and only redraws the squares that changed since the last frame.
+    """
+
+    def __init__(self):
+        """
+        Class constructor
+        Makes sure the image of every piece type and color is in the cache and draws the checkered board once.
+        """
+
+        for color in (WHITE, BLACK):
+            for piece_type in range(len(PIECE_NAMES)):
+                get_sprite(color, piece_type)
+
+        self.background = pygame.Surface((WIDTH, HEIGHT))
+        self.draw_board(self.background)
+
+        # what is drawn on every square, None before the first frame
+        self.drawn = None
+
+    @staticmethod
+    def draw_board(window):
+        """
+        A static method that draws the checkered board.
+
+        :param window: the window where it will be drawn
+        :return: None
+        """
+
+        # draws the checkered board
+        window.fill(BLACK_COLOR)
+        for row in range(ROWS):
+            for col in range(row % 2, ROWS, 2):
+                pygame.draw.rect(window, WHITE_COLOR, (row * SQUARE_SIZE, col * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+
+    @staticmethod
+    def get_square_rect(position):
+        """
+        A static method that determines the window rectangle of a square.
+
+        :param position: the column and row of the square
+        :return: the pygame Rect of the square
+        """
+
+        return pygame.Rect(position[0] * SQUARE_SIZE, HEIGHT - (position[1] + 1) * SQUARE_SIZE,
+                           SQUARE_SIZE, SQUARE_SIZE)
+
+    def invalidate(self):
+        """
+        Method that makes the next update redraw the whole board, for example after the window was covered.
+
+        :return: None
+        """
+
+        self.drawn = None
+
+    def update(self, window, board):
+        """
+        Method that redraws the squares whose piece or selection changed since the last update.
+
+        :param window: the window where it will be drawn
+        :param board: the board to draw
+        :return: a list of the pygame Rects that changed, to be passed to pygame.display.update
+        """
+
+        first_frame = self.drawn is None
+        if first_frame:
+            self.drawn = [[None] * 8 for i in range(8)]
+            window.blit(self.background, (0, 0))
+
+        rects = []
+        for x in range(8):
+            for y in range(8):
+                piece = board.pieces[x][y]
+                state = None if piece is None else (piece.color, piece.piece_type, piece is board.selected)
+                if state == self.drawn[x][y] and not first_frame:
+                    continue
+
+                # clears the square with the cached background and draws what is on it now
+                self.drawn[x][y] = state
+                rect = self.get_square_rect((x, y))
+                window.blit(self.background, rect, rect)
+                if piece is not None:
+                    if piece is board.selected:
+                        window.fill(SELECTED_COLOR, rect)
+                    window.blit(get_sprite(piece.color, piece.piece_type), rect)
+                rects.append(rect)
+
+        return [window.get_rect()] if first_frame else rects
@@ -0,0 +1,209 @@
+"""
+A headless runner that plays games between two AI configurations, for regression testing.
+
+The games are played in parallel by a pool of processes. Every finished game is appended to a PGN file and its
+result to a file of JSON lines as soon as it finishes, and a summary of the match is printed at the end:
+python selfplay.py --games 100 --a-depth 3 --b-depth 2 --output match
+
+The two configurations swap colors every game. Every game starts with a few random moves chosen from the seed,
+so the games are different from each other but can be reproduced.
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from ai import AI
+from board import Board, DRAW
+from pgn import PGNWriter
+from utils import WHITE
+
+
+def play_game(number, white, black, seed, random_plies, max_plies):
+    """
+    Plays one game between two AI configurations.
+
+    :param number: the number of the game, counted from 1
+    :param white: a dictionary of the AI arguments of the white side
+    :param black: a dictionary of the AI arguments of the black side
+    :param seed: the seed of the random opening moves
+    :param random_plies: the number of random moves the game starts with
+    :param max_plies: the number of plies after which the game is adjudicated a draw
+    :return: a dictionary with the result, the reason the game ended, the statistics and the PGN of the game
+    """
+
+    generator = random.Random(seed)
+    board = Board()
+    players = {WHITE: AI(**white), not WHITE: AI(**black)}
+    think_time = {WHITE: 0.0, not WHITE: 0.0}
+    move_count = {WHITE: 0, not WHITE: 0}
+    result, reason = DRAW, 'adjudication'
+
+    for ply in range(max_plies):
+        outcome = board.outcome()
+        if outcome is not None:
+            result, reason = outcome
+            break
+
+        if ply < random_plies:
+            board.push(generator.choice(board.legal_moves()))
+            continue
+
+        player = players[board.turn]
+        start = time.perf_counter()
+        move, score = player.engine.search(board)
+        think_time[board.turn] += time.perf_counter() - start
+        move_count[board.turn] += 1
+
+        board.push(move)
+    else:
+        # the game is only adjudicated if the last move allowed did not end it
+        outcome = board.outcome()
+        if outcome is not None:
+            result, reason = outcome
+
+    stream = io.StringIO()
+    PGNWriter(stream).write_board(board, {'Event': 'Self-play', 'Site': 'python-chess', 'Round': number,
+                                          'White': describe(white), 'Black': describe(black), 'Result': result})
+
+    return {
+        'game': number,
+        'result': result,
+        'reason': reason,
+        'plies': len(board.move_stack),
+        'white_time': think_time[WHITE],
+        'black_time': think_time[not WHITE],
+        'white_moves': move_count[WHITE],
+        'black_moves': move_count[not WHITE],
+        'pgn': stream.getvalue(),
+    }
+
+
+def describe(config):
+    """
+    Names an AI configuration.
+
+    :param config: a dictionary of AI arguments
+    :return: a short description, such as depth=3 time_limit=100
+    """
+
+    return ' '.join(f'{key}={value}' for key, value in config.items() if value is not None) or 'default'
+
+
+def run_match(config_a, config_b, games, workers, seed, random_plies, max_plies, output):
+    """
+    Plays a match between two AI configurations across a pool of processes, streaming the results to disk.
+
+    :param config_a: a dictionary of the AI arguments of the first configuration
+    :param config_b: a dictionary of the AI arguments of the second configuration
+    :param games: the number of games
+    :param workers: the number of processes, or None for one per core
+    :param seed: the seed of the match
+    :param random_plies: the number of random moves every game starts with
+    :param max_plies: the number of plies after which a game is adjudicated a draw
+    :param output: the path of the output files, without their extension
+    :return: the win, draw and loss count of the first configuration
+    """
+
+    score = {'win': 0, 'draw': 0, 'loss': 0}
+    time_a = time_b = 0.0
+    moves_a = moves_b = 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(workers) as executor, \
+            open(f'{output}.pgn', 'w', encoding='utf-8') as pgn_file, \
+            open(f'{output}.jsonl', 'w', encoding='utf-8') as results_file:
+
+        # the games are counted from 1, and the first configuration plays white in the odd ones
+        futures = {}
+        for number in range(1, games + 1):
+            white, black = (config_a, config_b) if number % 2 == 1 else (config_b, config_a)
+            future = executor.submit(play_game, number, white, black, seed * 1000003 + number, random_plies,
+                                     max_plies)
+            futures[future] = number
+
+        for future in as_completed(futures):
+            game = future.result()
+            a_is_white = game['game'] % 2 == 1
+
+            if game['result'] == DRAW:
+                outcome = 'draw'
+            elif (game['result'] == '1-0') == a_is_white:
+                outcome = 'win'
+            else:
+                outcome = 'loss'
+            score[outcome] += 1
+
+            if a_is_white:
+                time_a += game['white_time']
+                time_b += game['black_time']
+                moves_a += game['white_moves']
+                moves_b += game['black_moves']
+            else:
+                time_a += game['black_time']
+                time_b += game['white_time']
+                moves_a += game['black_moves']
+                moves_b += game['white_moves']
+
+            pgn_file.write(game.pop('pgn'))
+            pgn_file.flush()
+            game['a_outcome'] = outcome
+            results_file.write(json.dumps(game) + '\n')
+            results_file.flush()
+
+            print(f"game {game['game']}: {game['result']} by {game['reason']} in {game['plies']} plies, "
+                  f"A {score['win']}-{score['draw']}-{score['loss']}")
+
+    elapsed = time.perf_counter() - start
+    print(f"\nA ({describe(config_a)}) vs B ({describe(config_b)}): "
+          f"{score['win']} wins, {score['draw']} draws, {score['loss']} losses")
+    print(f'average time per move: A {time_a / max(moves_a, 1) * 1000:.1f} ms, '
+          f'B {time_b / max(moves_b, 1) * 1000:.1f} ms')
+    print(f'{games} games in {elapsed:.1f}s, {games / elapsed * 3600:.0f} games per hour')
+
+    return score
+
+
+def main():
+    """
+    Parses the command line arguments and runs the match.
+
+    :return: None
+    """
+
+    parser = argparse.ArgumentParser(description='Plays games between two AI configurations.')
+    parser.add_argument('--games', type=int, default=10, help='the number of games')
+    parser.add_argument('--workers', type=int, default=None, help='the number of processes, one per core by default')
+    parser.add_argument('--seed', type=int, default=0, help='the seed of the random opening moves')
+    parser.add_argument('--random-plies', type=int, default=2, help='the number of random moves every game starts with')
+    parser.add_argument('--max-plies', type=int, default=300, help='the length after which a game is drawn')
+    parser.add_argument('--output', default='selfplay', help='the path of the PGN and JSON lines files, '
+                                                                'without their extension')
+    for name in ('a', 'b'):
+        parser.add_argument(f'--{name}-depth', type=int, default=None, help=f'the maximum depth of {name.upper()}')
+        parser.add_argument(f'--{name}-time', type=int, default=None,
+                            help=f'the time budget of {name.upper()} per move, in milliseconds')
+        parser.add_argument(f'--{name}-nodes', type=int, default=None,
+                            help=f'the node budget of {name.upper()} per move')
+    arguments = parser.parse_args()
+
+    configs = []
+    for name in ('a', 'b'):
+        depth = getattr(arguments, f'{name}_depth')
+        time_limit = getattr(arguments, f'{name}_time')
+        node_limit = getattr(arguments, f'{name}_nodes')
+
+        # without any limit, the AI searches to its default depth
+        if depth is None and time_limit is None and node_limit is None:
+            depth = 3
+        configs.append({'depth': depth, 'time_limit': time_limit, 'node_limit': node_limit})
+
+    run_match(configs[0], configs[1], arguments.games, arguments.workers or os.cpu_count(), arguments.seed,
+              arguments.random_plies, arguments.max_plies, arguments.output)
+
+
+if __name__ == '__main__':
+    main()
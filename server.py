@@ -0,0 +1,443 @@
+"""
+A game server that hosts many games at the same time in one process, over a line-based TCP protocol.
+
+Every game is a headless board, which only takes a few kilobytes, so one process holds thousands of them. The moves
+are validated by the board the same way the interface validates them, and the engine replies are searched by a
+bounded pool of processes, so a slow search never blocks the other games:
+python server.py serve --port 8765
+
+Every command is a line, answered with a line starting with OK or ERR:
+NEW                      creates a game, answered with OK <game>
+MOVE <game> <move>       plays a move written like e2e4 or e7e8q, answered with OK <game> <move> <result>, where the
+                         result is * while the game goes on
+ENGINE <game> [depth]    lets the engine play the side to move, answered like MOVE
+MOVES <game>             answers with OK <game> followed by the legal moves
+FEN <game>               answers with OK <game> followed by the position
+CLOSE <game>             ends a game and frees its board
+STATS                    reports the number of games, the memory of a game with the moves played so far and the
+                         move validation latency
+QUIT                     closes the connection
+
+The bench mode starts a server and plays random games against it from local clients, then reports the statistics:
+python server.py bench --games 1000 --clients 50 --moves 20
+"""
+
+import argparse
+import asyncio
+import collections
+import itertools
+import os
+import random
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from board import Board
+from engine import Engine
+from move import Move
+from utils import PAWN, QUEEN
+
+DEFAULT_PORT = 8765
+DEFAULT_ENGINE_DEPTH = 3
+MAX_ENGINE_DEPTH = 6
+
+# how many latency samples are kept for the percentiles
+LATENCY_SAMPLES = 100000
+
+# the engine of the worker process
+_engine = None
+
+
+def _init_worker():
+    """
+    Creates the engine of a worker process.
+
+    :return: None
+    """
+
+    global _engine
+    _engine = Engine(None, 8)
+
+
+def _engine_move(data, history, depth):
+    """
+    Searches a position in a worker process.
+
+    :param data: the position, packed by Board.encode
+    :param history: the keys of the positions the position could repeat, from Board.hash_history
+    :param depth: the depth of the search, in plies
+    :return: the best move packed by Move.to_int, or None if there are no moves
+    """
+
+    board = Board.decode(data)
+    board.root_hashes = list(history)
+    move, score = _engine.search(board, depth)
+    return None if move is None else move.to_int()
+
+
+def measure_game_memory(count=20, plies=60):
+    """
+    Measures the memory a game takes, by creating boards and playing random moves on them while the allocations
+    are traced. A game grows with every move, by the undo record of the move, so both costs are measured.
+
+    :param count: the number of boards to create
+    :param plies: the number of moves to play on every board
+    :return: a tuple consisting of the average number of bytes of a new board and of a move, or (0, 0) if the
+     allocations are already traced by someone else
+    """
+
+    if tracemalloc.is_tracing():
+        return 0, 0
+
+    generator = random.Random(0)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    boards = [Board() for i in range(count)]
+    created = tracemalloc.get_traced_memory()[0]
+
+    played = 0
+    for board in boards:
+        for ply in range(plies):
+            moves = board.legal_moves()
+            if not moves:
+                break
+            board.push(generator.choice(moves))
+            played += 1
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return (created - before) // count, (after - created) // max(played, 1)
+
+
+class GameServer:
+    """
+    The implementation of the game server.
+    """
+
+    def __init__(self, workers=None, max_pending=None):
+        """
+        Class constructor
+
+        :param workers: the number of engine processes, or None for one per core
+        :param max_pending: the number of engine replies that can wait for a process, or None for twice the number
+         of processes
+        """
+
+        self.games = {}
+        self.game_ids = itertools.count(1)
+        self.thinking = set()
+        self.workers = workers or os.cpu_count()
+        self.executor = ProcessPoolExecutor(self.workers, initializer=_init_worker)
+        self.max_pending = max_pending or 2 * self.workers
+        self.pending = 0
+        self.latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+        self.validations = 0
+        self.board_memory, self.move_memory = measure_game_memory()
+
+    async def handle_client(self, reader, writer):
+        """
+        A coroutine that answers the commands of a connection, one line at a time.
+
+        :param reader: the asyncio StreamReader of the connection
+        :param writer: the asyncio StreamWriter of the connection
+        :return: None
+        """
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode('utf-8', 'replace').strip()
+                if command.upper() == 'QUIT':
+                    break
+
+                writer.write((await self.handle(command) + '\n').encode('utf-8'))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle(self, command):
+        """
+        A coroutine that runs one command.
+
+        :param command: the command line
+        :return: the answer, without its line end
+        """
+
+        tokens = command.split()
+        if not tokens:
+            return 'ERR empty command'
+        name, arguments = tokens[0].upper(), tokens[1:]
+
+        if name == 'NEW':
+            game_id = next(self.game_ids)
+            self.games[game_id] = Board()
+            return f'OK {game_id}'
+        if name == 'STATS':
+            return self.stats()
+
+        if name not in ('MOVE', 'ENGINE', 'MOVES', 'FEN', 'CLOSE'):
+            return f'ERR unknown command {tokens[0]}'
+        if not arguments or not arguments[0].isdigit() or int(arguments[0]) not in self.games:
+            return 'ERR unknown game'
+        game_id = int(arguments[0])
+        board = self.games[game_id]
+
+        if name == 'MOVES':
+            return ' '.join([f'OK {game_id}'] + [move.to_uci() for move in board.legal_moves()])
+        if name == 'FEN':
+            return f'OK {game_id} {board.to_fen()}'
+        if name == 'CLOSE':
+            del self.games[game_id]
+            self.thinking.discard(game_id)
+            return f'OK {game_id}'
+
+        if game_id in self.thinking:
+            return f'ERR {game_id} the engine is thinking'
+        if board.game_ended:
+            return f'ERR {game_id} the game is over'
+        if name == 'MOVE':
+            if len(arguments) != 2:
+                return f'ERR {game_id} expected a move'
+            return self.play(game_id, board, arguments[1])
+
+        depth = int(arguments[1]) if len(arguments) > 1 and arguments[1].isdigit() else DEFAULT_ENGINE_DEPTH
+        return await self.engine_reply(game_id, board, min(max(depth, 1), MAX_ENGINE_DEPTH))
+
+    def play(self, game_id, board, text):
+        """
+        A method that validates and plays a move, measuring how long the validation takes.
+
+        :param game_id: the number of the game
+        :param board: the board of the game
+        :param text: the move, such as e2e4 or e7e8q
+        :return: the answer
+        """
+
+        try:
+            move = Move.from_uci(text)
+        except ValueError:
+            return f'ERR {game_id} invalid move {text}'
+
+        start = time.perf_counter()
+        piece = board.pieces[move.start[0]][move.start[1]]
+        # a promotion letter is only allowed on a pawn reaching the last row
+        legal = piece is not None and piece.color == board.turn and \
+            (move.promotion is None or piece.piece_type == PAWN and move.end[1] in (0, 7)) and \
+            board.move_piece(piece, move.end, move.promotion or QUEEN)
+        self.latencies.append(time.perf_counter() - start)
+        self.validations += 1
+
+        if not legal:
+            return f'ERR {game_id} illegal move {text}'
+        # answers with the move that was played, which names the promotion even if the player left it out
+        played = board.move_stack[-1].move
+        return f'OK {game_id} {played.to_uci()} {board.result if board.game_ended else "*"}'
+
+    async def engine_reply(self, game_id, board, depth):
+        """
+        A coroutine that lets the engine play the side to move, in the process pool.
+        No more engine replies than the bound can wait for a process, the others are turned down right away.
+
+        :param game_id: the number of the game
+        :param board: the board of the game
+        :param depth: the depth of the search, in plies
+        :return: the answer
+        """
+
+        if self.pending >= self.max_pending:
+            return f'ERR {game_id} the engine is busy'
+
+        self.pending += 1
+        self.thinking.add(game_id)
+        try:
+            loop = asyncio.get_running_loop()
+            packed = await loop.run_in_executor(self.executor, _engine_move, board.encode(), board.hash_history(),
+                                                depth)
+        finally:
+            self.pending -= 1
+            self.thinking.discard(game_id)
+
+        # the game could have been closed while the engine was thinking
+        if game_id not in self.games:
+            return f'ERR {game_id} the game was closed'
+        if packed is None:
+            return f'ERR {game_id} there are no moves'
+
+        return self.play(game_id, board, Move.from_int(packed).to_uci())
+
+    def latency_percentile(self, percentile):
+        """
+        Computes a percentile of the recent move validation latencies.
+
+        :param percentile: the percentile, between 0 and 100
+        :return: the latency in microseconds, or 0 if no move was validated yet
+        """
+
+        if not self.latencies:
+            return 0.0
+
+        samples = sorted(self.latencies)
+        index = min(len(samples) - 1, int(len(samples) * percentile / 100))
+        return samples[index] * 1e6
+
+    def game_memory(self):
+        """
+        Estimates the memory of the games being played, from the measured cost of a board and of a move.
+
+        :return: the average number of bytes of a game
+        """
+
+        if not self.games:
+            return self.board_memory
+
+        plies = sum(len(board.move_stack) for board in self.games.values()) / len(self.games)
+        return int(self.board_memory + plies * self.move_memory)
+
+    def stats(self):
+        """
+        A method that reports the state of the server.
+
+        :return: the answer to the STATS command
+        """
+
+        return (f'OK games={len(self.games)} bytes_per_game={self.game_memory()} validations={self.validations} '
+                f'p50_us={self.latency_percentile(50):.0f} p99_us={self.latency_percentile(99):.0f} '
+                f'engine_pending={self.pending}')
+
+    async def serve(self, host, port):
+        """
+        A coroutine that accepts connections until it is cancelled.
+
+        :param host: the address to listen on
+        :param port: the port to listen on
+        :return: None
+        """
+
+        server = await asyncio.start_server(self.handle_client, host, port)
+        print(f'listening on {", ".join(str(socket.getsockname()) for socket in server.sockets)}')
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        """
+        A method that stops the engine processes.
+
+        :return: None
+        """
+
+        self.executor.shutdown(cancel_futures=True)
+
+
+async def run_client(host, port, games, moves, engine_every, seed):
+    """
+    A coroutine that plays random games from one connection, with some of the replies left to the engine.
+
+    :param host: the address of the server
+    :param port: the port of the server
+    :param games: the number of games the client plays
+    :param moves: the number of moves every game lasts at most
+    :param engine_every: every how many games the moves are left to the engine, or 0 for never
+    :param seed: the seed of the random moves
+    :return: the number of moves played
+    """
+
+    generator = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+
+    async def request(line):
+        writer.write((line + '\n').encode('utf-8'))
+        await writer.drain()
+        return (await reader.readline()).decode('utf-8').split()
+
+    game_ids = [(await request('NEW'))[1] for i in range(games)]
+    played = 0
+    for ply in range(moves):
+        for index, game_id in enumerate(game_ids):
+            if engine_every and index % engine_every == 0:
+                answer = await request(f'ENGINE {game_id} 1')
+            else:
+                legal = (await request(f'MOVES {game_id}'))[2:]
+                if not legal:
+                    continue
+                answer = await request(f'MOVE {game_id} {generator.choice(legal)}')
+            played += answer[0] == 'OK'
+
+    writer.write(b'QUIT\n')
+    await writer.drain()
+    writer.close()
+
+    return played
+
+
+async def bench(games, clients, moves, engine_every, workers):
+    """
+    A coroutine that starts a server, plays games against it from local clients and reports the statistics.
+
+    :param games: the number of games
+    :param clients: the number of connections the games are spread over
+    :param moves: the number of moves every game lasts at most
+    :param engine_every: every how many games the moves are left to the engine, or 0 for never
+    :param workers: the number of engine processes
+    :return: None
+    """
+
+    game_server = GameServer(workers)
+    server = await asyncio.start_server(game_server.handle_client, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+
+    start = time.perf_counter()
+    counts = await asyncio.gather(*(run_client('127.0.0.1', port, games // clients + (i < games % clients), moves,
+                                               engine_every, i) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    print(f'{games} games over {clients} connections, {sum(counts)} moves in {elapsed:.2f}s, '
+          f'{sum(counts) / elapsed:.0f} moves/s')
+    print(game_server.stats())
+
+    server.close()
+    await server.wait_closed()
+    game_server.close()
+
+
+def main():
+    """
+    Parses the command line arguments and runs the server or the bench.
+
+    :return: None
+    """
+
+    parser = argparse.ArgumentParser(description='Hosts many games at the same time over TCP.')
+    subparsers = parser.add_subparsers(dest='mode', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help='run the server')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='the address to listen on')
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='the port to listen on')
+    serve_parser.add_argument('--workers', type=int, default=None, help='the number of engine processes')
+
+    bench_parser = subparsers.add_parser('bench', help='play random games against a local server')
+    bench_parser.add_argument('--games', type=int, default=1000, help='the number of games')
+    bench_parser.add_argument('--clients', type=int, default=50, help='the number of connections')
+    bench_parser.add_argument('--moves', type=int, default=20, help='the number of moves of every game')
+    bench_parser.add_argument('--engine-every', type=int, default=0,
+                              help='every how many games the moves are left to the engine, 0 for never')
+    bench_parser.add_argument('--workers', type=int, default=None, help='the number of engine processes')
+    arguments = parser.parse_args()
+
+    if arguments.mode == 'serve':
+        game_server = GameServer(arguments.workers)
+        try:
+            asyncio.run(game_server.serve(arguments.host, arguments.port))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            game_server.close()
+    else:
+        asyncio.run(bench(arguments.games, arguments.clients, arguments.moves, arguments.engine_every,
+                          arguments.workers))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,717 @@
+"""
+Endgame tablebases, which know the result and the distance to mate of every position with few pieces.
+
+A table covers one material signature, such as KQK or KRKB, the pieces of the stronger side first. It is generated
+by retrograde analysis: the checkmates are found first, then every position that mates in one, every position
+that can't avoid being mated in two, and so on, going backwards from the positions already solved by unmaking
+moves. The captures and promotions leave the table, so their results come from the tables of the material they
+lead to, which are generated first. The positions nobody can force a mate from are draws.
+
+Every table is a file of one byte per position, from the point of view of the side to move: 0 for a draw, 1 to 127
+for a win in that many plies and 128 + n for a loss in n plies. The positions are indexed by the side to move and
+the squares of the pieces, with the white king kept in a fixed part of the board by the symmetries of the board,
+so the tables without pawns are 6.4 times smaller. The files are memory-mapped when they are probed, so only the
+pages that are used are ever read.
+
+The tables don't know about castling rights, so the positions with castling rights are not probed, nor about the
+fifty-move rule, so a mate that takes too long might only be a draw. The signatures with pawns of both sides, where
+en passant captures matter, are not supported.
+
+The three-piece tables are generated in a few seconds, the four-piece ones take a while:
+python tablebase.py generate tablebases KQK KRK KPK KQKR
+python tablebase.py probe tablebases 8/8/8/4k3/8/8/8/4K2R w - - 0 1
+"""
+
+import argparse
+import itertools
+import mmap
+import os
+import time
+from board import Board, KNIGHT_TARGETS, KING_TARGETS, PAWN_TARGETS, RAYS, RAY_DIRECTIONS, SLIDING_DIRECTIONS, \
+    PROMOTION_TYPES
+from evaluation import PIECE_VALUES
+from utils import *
+
+MAX_PIECES = 4
+PIECE_LETTERS = 'PNBRQK'
+DEFAULT_SIGNATURES = ('KQK', 'KRK', 'KBK', 'KNK', 'KPK')
+
+# the longest distance to mate a byte can hold
+MAX_PLIES = 127
+LOSS = 128
+
+# the state of the positions during the generation
+INVALID, UNKNOWN, RESOLVED, WIN_PENDING, LOSS_PENDING, DRAWING = range(6)
+
+KNIGHT_SETS = tuple(frozenset(targets) for targets in KNIGHT_TARGETS)
+KING_SETS = tuple(frozenset(targets) for targets in KING_TARGETS)
+PAWN_SETS = tuple(tuple(frozenset(targets) for targets in table) for table in PAWN_TARGETS)
+
+
+def _line_table():
+    """
+    Computes the direction from every square to every other square on the same line, and the squares between them.
+
+    :return: a list indexed by square * 64 + other square of (direction, bitboard of the squares between) tuples,
+     or None for the squares that are not on the same line
+    """
+
+    table = [None] * 4096
+    for square in range(64):
+        for direction in range(len(RAY_DIRECTIONS)):
+            between = 0
+            for target in RAYS[direction][square]:
+                table[square * 64 + target] = (direction, between)
+                between |= 1 << target
+
+    return table
+
+
+LINES = _line_table()
+
+
+def _transform(flip_x, flip_y, swap):
+    """
+    Computes a symmetry of the board.
+
+    :param flip_x: True to mirror the columns
+    :param flip_y: True to mirror the rows
+    :param swap: True to mirror the board along the a1-h8 diagonal, before the other mirrors
+    :return: a tuple of the image of every square
+    """
+
+    table = []
+    for square in range(64):
+        x, y = square & 7, square >> 3
+        if swap:
+            x, y = y, x
+        if flip_x:
+            x = 7 - x
+        if flip_y:
+            y = 7 - y
+        table.append(y * 8 + x)
+
+    return tuple(table)
+
+
+# without pawns all eight symmetries of the board keep the positions the same, with pawns only the column mirror
+PAWNLESS_TRANSFORMS = tuple(_transform(*flags) for flags in itertools.product((False, True), repeat=3))
+PAWN_TRANSFORMS = (_transform(False, False, False), _transform(True, False, False))
+
+
+def decode_value(value):
+    """
+    Converts a byte of a table to a result.
+
+    :param value: the byte
+    :return: a tuple consisting of 1 for a win of the side to move, 0 for a draw or -1 for a loss, and the number of
+     plies to the mate
+    """
+
+    if value == 0:
+        return 0, 0
+    if value < LOSS:
+        return 1, value
+
+    return -1, value - LOSS
+
+
+class Signature:
+    """
+    The material of a table, and the way its positions are indexed.
+    """
+
+    def __init__(self, name):
+        """
+        Class constructor
+
+        :param name: the name of the material, such as KQKR, with the white pieces first, each side starting with
+         its king and going on from the most to the least valuable piece
+        """
+
+        black_king = name.find('K', 1)
+        if not name.startswith('K') or black_king < 0 or any(letter not in PIECE_LETTERS for letter in name):
+            raise ValueError(f'{name} is not a material signature')
+
+        white = sorted((PIECE_LETTERS.index(letter) for letter in name[:black_king]), reverse=True)
+        black = sorted((PIECE_LETTERS.index(letter) for letter in name[black_king:]), reverse=True)
+        if white.count(KING) != 1 or black.count(KING) != 1:
+            raise ValueError(f'{name} is not a material signature')
+        if len(white) + len(black) > MAX_PIECES:
+            raise ValueError(f'{name} has more than {MAX_PIECES} pieces')
+        if PAWN in white and PAWN in black:
+            raise ValueError(f'{name} has pawns of both sides, which are not supported')
+
+        self.name = name
+        self.pieces = tuple((WHITE, piece_type) for piece_type in white) + \
+            tuple((BLACK, piece_type) for piece_type in black)
+        self.has_pawns = PAWN in white or PAWN in black
+
+        # the squares the white king is kept on, and the symmetries that bring it there from every square
+        if self.has_pawns:
+            self.transforms = PAWN_TRANSFORMS
+            self.region = tuple(square for square in range(64) if square & 7 <= 3)
+        else:
+            self.transforms = PAWNLESS_TRANSFORMS
+            self.region = tuple(square for square in range(64) if (square >> 3) <= (square & 7) <= 3)
+        self.region_index = {square: index for index, square in enumerate(self.region)}
+        self.king_transforms = tuple(tuple(transform for transform in self.transforms
+                                           if transform[square] in self.region_index) for square in range(64))
+
+        # the pieces of the same type and color can be swapped, so their squares are sorted
+        self.groups = tuple((start, start + len(group)) for start, group in self._runs(self.pieces) if len(group) > 1)
+        self.size = 2 * len(self.region) * 64 ** (len(self.pieces) - 1)
+
+    @staticmethod
+    def _runs(pieces):
+        """
+        A generator of the runs of identical pieces.
+
+        :param pieces: a tuple of (color, type) tuples
+        :return: a generator of (start index, tuple of the pieces of the run) tuples
+        """
+
+        start = 0
+        for piece, group in itertools.groupby(pieces):
+            group = tuple(group)
+            yield start, group
+            start += len(group)
+
+    def index(self, squares, turn):
+        """
+        Computes the index of a position, the same for all the positions that are symmetric to each other.
+
+        :param squares: the squares of the pieces, in the order of the signature
+        :param turn: the side to move
+        :return: the index of the position in the table
+        """
+
+        best = None
+        for transform in self.king_transforms[squares[0]]:
+            mapped = [transform[square] for square in squares]
+            for start, end in self.groups:
+                mapped[start:end] = sorted(mapped[start:end])
+            if best is None or mapped < best:
+                best = mapped
+
+        index = turn * len(self.region) + self.region_index[best[0]]
+        for square in best[1:]:
+            index = index * 64 + square
+
+        return index
+
+    def squares(self, index):
+        """
+        Finds the position of an index.
+
+        :param index: the index of the position in the table
+        :return: a tuple consisting of the list of the squares of the pieces and the side to move
+        """
+
+        squares = [0] * len(self.pieces)
+        for i in range(len(self.pieces) - 1, 0, -1):
+            index, squares[i] = divmod(index, 64)
+        turn, king = divmod(index, len(self.region))
+        squares[0] = self.region[king]
+
+        return squares, turn
+
+
+def normalize(pieces, turn):
+    """
+    Finds the table of a position, swapping the colors if black is the stronger side.
+
+    :param pieces: a list of (color, type, square) tuples
+    :param turn: the side to move
+    :return: a tuple consisting of the name of the table, the squares of the pieces in its order and the side to
+     move in it
+    """
+
+    def strength(color):
+        types = sorted((piece_type for piece_color, piece_type, square in pieces if piece_color == color),
+                       reverse=True)
+        return [PIECE_VALUES[piece_type] for piece_type in types], types
+
+    if strength(BLACK) > strength(WHITE):
+        # the board is mirrored between the rows, so the pawns still move towards the other side
+        pieces = [(not color, piece_type, square ^ 56) for color, piece_type, square in pieces]
+        turn = not turn
+
+    pieces = sorted(pieces, key=lambda piece: (piece[0] != WHITE, -piece[1]))
+    name = ''.join(PIECE_LETTERS[piece_type] for color, piece_type, square in pieces)
+
+    return name, [square for color, piece_type, square in pieces], int(turn)
+
+
+def is_attacked(pieces, squares, occupied, target, color):
+    """
+    Checks if a square is attacked by the pieces of a side.
+
+    :param pieces: the (color, type) tuples of the pieces
+    :param squares: the squares of the pieces, -1 for a captured piece
+    :param occupied: a bitboard of the occupied squares
+    :param target: the square
+    :param color: the attacking side
+    :return: True if the square is attacked, False otherwise
+    """
+
+    for (piece_color, piece_type), square in zip(pieces, squares):
+        if piece_color != color or square < 0:
+            continue
+        if piece_type == KNIGHT:
+            if target in KNIGHT_SETS[square]:
+                return True
+        elif piece_type == KING:
+            if target in KING_SETS[square]:
+                return True
+        elif piece_type == PAWN:
+            if target in PAWN_SETS[color][square]:
+                return True
+        else:
+            line = LINES[square * 64 + target]
+            if line is not None and line[0] in SLIDING_DIRECTIONS[piece_type] and not line[1] & occupied:
+                return True
+
+    return False
+
+
+def generate_moves(pieces, squares, occupied, color):
+    """
+    A generator of the pseudo-legal moves of a side, without castling or en passant.
+
+    :param pieces: the (color, type) tuples of the pieces
+    :param squares: the squares of the pieces
+    :param occupied: a bitboard of the occupied squares
+    :param color: the side to move
+    :return: a generator of (index of the moving piece, target square, index of the captured piece or None) tuples
+    """
+
+    for i, ((piece_color, piece_type), square) in enumerate(zip(pieces, squares)):
+        if piece_color != color:
+            continue
+
+        if piece_type == PAWN:
+            step = 8 if color == WHITE else -8
+            targets = [target for target in PAWN_TARGETS[color][square] if occupied >> target & 1]
+            if not occupied >> (square + step) & 1:
+                targets.append(square + step)
+                if (square >> 3) == (1 if color == WHITE else 6) and not occupied >> (square + 2 * step) & 1:
+                    targets.append(square + 2 * step)
+        elif piece_type == KNIGHT:
+            targets = KNIGHT_TARGETS[square]
+        elif piece_type == KING:
+            targets = KING_TARGETS[square]
+        else:
+            targets = []
+            for direction in SLIDING_DIRECTIONS[piece_type]:
+                for target in RAYS[direction][square]:
+                    targets.append(target)
+                    if occupied >> target & 1:
+                        break
+
+        for target in targets:
+            captured = None
+            if occupied >> target & 1:
+                captured = squares.index(target)
+                if pieces[captured][0] == color or pieces[captured][1] == KING:
+                    continue
+            yield i, target, captured
+
+
+def generate_unmoves(pieces, squares, occupied, color):
+    """
+    A generator of the moves that could have led to a position, leaving out the captures and promotions, which come
+    from other tables.
+
+    :param pieces: the (color, type) tuples of the pieces
+    :param squares: the squares of the pieces
+    :param occupied: a bitboard of the occupied squares
+    :param color: the side that made the move
+    :return: a generator of (index of the piece that moved, square it came from) tuples
+    """
+
+    for i, ((piece_color, piece_type), square) in enumerate(zip(pieces, squares)):
+        if piece_color != color:
+            continue
+
+        if piece_type == PAWN:
+            step = 8 if color == WHITE else -8
+            origin = square - step
+            if not occupied >> origin & 1 and 1 <= (origin >> 3) <= 6:
+                yield i, origin
+                if (square >> 3) == (3 if color == WHITE else 4) and not occupied >> (origin - step) & 1:
+                    yield i, origin - step
+            continue
+
+        if piece_type == KNIGHT:
+            origins = KNIGHT_TARGETS[square]
+        elif piece_type == KING:
+            origins = KING_TARGETS[square]
+        else:
+            origins = []
+            for direction in SLIDING_DIRECTIONS[piece_type]:
+                for origin in RAYS[direction][square]:
+                    if occupied >> origin & 1:
+                        break
+                    origins.append(origin)
+
+        for origin in origins:
+            if not occupied >> origin & 1:
+                yield i, origin
+
+
+class Tablebases:
+    """
+    A directory of tables, which are generated into it and probed from it.
+    """
+
+    def __init__(self, directory):
+        """
+        Class constructor
+
+        :param directory: the directory of the table files
+        """
+
+        self.directory = directory
+        self.signatures = {}
+        # the tables that were opened or generated, None for the ones that are missing
+        self.tables = {}
+
+    def path(self, name):
+        """
+        Finds the file of a table.
+
+        :param name: the name of the table
+        :return: the path of the file
+        """
+
+        return os.path.join(self.directory, f'{name}.tb')
+
+    def signature(self, name):
+        """
+        Finds the indexing of a table.
+
+        :param name: the name of the table
+        :return: the Signature
+        """
+
+        if name not in self.signatures:
+            self.signatures[name] = Signature(name)
+
+        return self.signatures[name]
+
+    def table(self, name):
+        """
+        Opens a table, mapping its file the first time it is needed.
+
+        :param name: the name of the table
+        :return: the bytes of the table, or None if there is no such table
+        """
+
+        if name not in self.tables:
+            try:
+                signature = self.signature(name)
+                with open(self.path(name), 'rb') as stream:
+                    self.tables[name] = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                self.tables[name] = None
+            else:
+                if len(self.tables[name]) != signature.size:
+                    raise ValueError(f'{self.path(name)} is not a {name} table')
+
+        return self.tables[name]
+
+    def probe_pieces(self, pieces, turn):
+        """
+        Looks up a position in the tables.
+
+        :param pieces: a list of (color, type, square) tuples
+        :param turn: the side to move
+        :return: the byte of the position, from the point of view of the side to move, or None if there is no table
+         for its material
+        """
+
+        name, squares, turn = normalize(pieces, turn)
+        table = self.table(name)
+        if table is None:
+            return None
+
+        return table[self.signature(name).index(squares, turn)]
+
+    def probe(self, board):
+        """
+        A method that looks up the position of a board.
+
+        :param board: the current board
+        :return: a tuple consisting of 1 if the side to move wins, 0 if it is a draw or -1 if it loses, and the
+         number of plies to the mate, or None if the position is not in the tables
+        """
+
+        if board.piece_count > MAX_PIECES or board.castling_rights or board.en_passant is not None:
+            return None
+
+        pieces = [(piece.color, piece.piece_type, y * 8 + x)
+                  for x, column in enumerate(board.pieces) for y, piece in enumerate(column) if piece is not None]
+        value = self.probe_pieces(pieces, board.turn)
+
+        return None if value is None else decode_value(value)
+
+    def best_move(self, board):
+        """
+        A method that finds the move that wins the fastest, holds the draw, or loses the slowest.
+
+        :param board: the current board
+        :return: a tuple consisting of the best Move and the result of the position as returned by probe, or None if
+         the position or one of the positions its moves lead to is not in the tables
+        """
+
+        if self.probe(board) is None:
+            return None
+
+        best_move, best_key, best_result = None, None, None
+        for move in board.legal_moves():
+            board.push(move)
+            result = self.probe(board)
+            board.pop()
+            if result is None:
+                return None
+
+            outcome, plies = -result[0], result[1] + 1
+            key = (outcome, -plies if outcome > 0 else plies)
+            if best_key is None or key > best_key:
+                best_move, best_key, best_result = move, key, (outcome, plies if outcome else 0)
+
+        return None if best_move is None else (best_move, best_result)
+
+    def dependencies(self, name):
+        """
+        Finds the tables the captures and promotions of a table lead to.
+
+        :param name: the name of the table
+        :return: a set of the names of the tables
+        """
+
+        pieces = [(color, piece_type, 0) for color, piece_type in self.signature(name).pieces]
+        names = set()
+        for i, (color, piece_type, square) in enumerate(pieces):
+            if piece_type == KING:
+                continue
+            names.add(normalize(pieces[:i] + pieces[i + 1:], WHITE)[0])
+            if piece_type == PAWN:
+                for promotion in PROMOTION_TYPES:
+                    names.add(normalize(pieces[:i] + [(color, promotion, 0)] + pieces[i + 1:], WHITE)[0])
+
+        return names
+
+    def generate(self, name, log=print):
+        """
+        A method that generates a table and writes it to the directory, after the tables it depends on.
+        The tables that are already in the directory are not generated again.
+
+        :param name: the name of the table
+        :param log: a function called with a line of progress, or None
+        :return: None
+        """
+
+        name = normalize([(color, piece_type, 0) for color, piece_type in Signature(name).pieces], WHITE)[0]
+        if self.table(name) is not None:
+            return
+        for dependency in sorted(self.dependencies(name)):
+            self.generate(dependency, log)
+
+        start = time.perf_counter()
+        values = self.solve(self.signature(name))
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path(name) + '.tmp', 'wb') as stream:
+            stream.write(values)
+        os.replace(self.path(name) + '.tmp', self.path(name))
+        self.tables[name] = values
+
+        if log is not None:
+            longest = max((value if value < LOSS else value - LOSS for value in set(values)), default=0)
+            log(f'{name}: {len(values)} positions in {time.perf_counter() - start:.1f}s, longest mate {longest} plies')
+
+    def solve(self, signature):
+        """
+        A method that computes the values of all the positions of a table by retrograde analysis.
+
+        :param signature: the Signature of the table
+        :return: a bytearray of the values, indexed like the table
+        """
+
+        pieces = signature.pieces
+        king_indexes = {color: pieces.index((color, KING)) for color in (WHITE, BLACK)}
+        values = bytearray(signature.size)
+        status = bytearray(signature.size)
+        remaining = bytearray(signature.size)
+        exit_losses = bytearray(signature.size)
+        pending = {}
+        current = []
+
+        # the first pass counts the moves of every position that stay in the table and scores the others
+        for index in range(signature.size):
+            squares, turn = signature.squares(index)
+            occupied = 0
+            for square in squares:
+                occupied |= 1 << square
+            if bin(occupied).count('1') != len(squares) or signature.index(squares, turn) != index:
+                continue
+            if any(piece_type == PAWN and not 1 <= (square >> 3) <= 6
+                   for (color, piece_type), square in zip(pieces, squares)):
+                continue
+            # the side that just moved can't be in check
+            if is_attacked(pieces, squares, occupied, squares[king_indexes[not turn]], turn):
+                continue
+
+            children = set()
+            has_moves = False
+            best_win = worst_loss = 0
+            drawing = False
+            for i, target, captured in generate_moves(pieces, squares, occupied, turn):
+                child = list(squares)
+                child[i] = target
+                if captured is not None:
+                    child[captured] = -1
+                child_occupied = occupied & ~(1 << squares[i]) | 1 << target
+                if is_attacked(pieces, child, child_occupied, child[king_indexes[turn]], not turn):
+                    continue
+                has_moves = True
+
+                color, piece_type = pieces[i]
+                promotions = PROMOTION_TYPES if piece_type == PAWN and (target >> 3) in (0, 7) else ()
+                if captured is None and not promotions:
+                    children.add(signature.index(child, not turn))
+                    continue
+
+                # the move leaves the table, its result comes from the table of the material it leads to
+                for new_type in promotions or (piece_type,):
+                    child_pieces = [(pieces[j][0], new_type if j == i else pieces[j][1], child[j])
+                                    for j in range(len(pieces)) if child[j] >= 0]
+                    value = self.probe_pieces(child_pieces, not turn)
+                    if value is None:
+                        raise ValueError(f'{signature.name} needs the table of {normalize(child_pieces, turn)[0]}')
+                    outcome, plies = decode_value(value)
+                    if outcome < 0:
+                        best_win = min(best_win, plies + 1) if best_win else plies + 1
+                    elif outcome > 0:
+                        worst_loss = max(worst_loss, plies + 1)
+                    else:
+                        drawing = True
+
+            if not has_moves:
+                status[index] = RESOLVED
+                if is_attacked(pieces, squares, occupied, squares[king_indexes[turn]], not turn):
+                    values[index] = LOSS
+                    current.append(index)
+                continue
+
+            remaining[index] = len(children)
+            if best_win:
+                status[index] = WIN_PENDING
+                pending.setdefault(best_win, []).append(index)
+            elif drawing:
+                status[index] = DRAWING
+            elif not children:
+                status[index] = LOSS_PENDING
+                pending.setdefault(worst_loss, []).append(index)
+            else:
+                status[index] = UNKNOWN
+                exit_losses[index] = worst_loss
+
+        # the positions solved at every distance solve the ones a move before them
+        plies = 0
+        while current or pending:
+            solved = []
+            for index in current:
+                squares, turn = signature.squares(index)
+                occupied = 0
+                for square in squares:
+                    occupied |= 1 << square
+                lost = values[index] >= LOSS
+
+                predecessors = set()
+                for i, origin in generate_unmoves(pieces, squares, occupied, not turn):
+                    parent = list(squares)
+                    parent[i] = origin
+                    predecessors.add(signature.index(parent, not turn))
+
+                for parent in predecessors:
+                    state = status[parent]
+                    if state in (INVALID, RESOLVED, LOSS_PENDING):
+                        continue
+                    if lost:
+                        status[parent] = RESOLVED
+                        values[parent] = plies + 1
+                        solved.append(parent)
+                    elif state == UNKNOWN:
+                        remaining[parent] -= 1
+                        if remaining[parent] == 0:
+                            # every move loses, the slowest of them decides the distance
+                            if exit_losses[parent] > plies + 1:
+                                status[parent] = LOSS_PENDING
+                                pending.setdefault(exit_losses[parent], []).append(parent)
+                            else:
+                                status[parent] = RESOLVED
+                                values[parent] = LOSS + plies + 1
+                                solved.append(parent)
+
+            plies += 1
+            for index in pending.pop(plies, ()):
+                if status[index] == WIN_PENDING:
+                    values[index] = plies
+                elif status[index] == LOSS_PENDING:
+                    values[index] = LOSS + plies
+                else:
+                    continue
+                status[index] = RESOLVED
+                solved.append(index)
+
+            if solved and plies > MAX_PLIES:
+                raise ValueError(f'{signature.name} has mates longer than {MAX_PLIES} plies')
+            current = solved
+
+        return values
+
+
+def main():
+    """
+    Parses the command line arguments and generates or probes tables.
+
+    :return: None
+    """
+
+    parser = argparse.ArgumentParser(description='Generates and probes endgame tablebases.')
+    subparsers = parser.add_subparsers(dest='mode', required=True)
+
+    generate_parser = subparsers.add_parser('generate', help='generate tables')
+    generate_parser.add_argument('directory', help='the directory of the tables')
+    generate_parser.add_argument('signatures', nargs='*', default=DEFAULT_SIGNATURES,
+                                 help='the materials to generate, such as KQK or KRKB, the three-piece ones by default')
+
+    probe_parser = subparsers.add_parser('probe', help='probe a position')
+    probe_parser.add_argument('directory', help='the directory of the tables')
+    probe_parser.add_argument('fen', nargs='+', help='the position')
+    arguments = parser.parse_args()
+
+    tablebases = Tablebases(arguments.directory)
+    if arguments.mode == 'generate':
+        for name in arguments.signatures:
+            tablebases.generate(name)
+        return
+
+    board = Board.from_fen(' '.join(arguments.fen))
+    found = tablebases.best_move(board)
+    if found is None:
+        print('the position is not in the tables')
+        return
+
+    move, (outcome, plies) = found
+    if outcome == 0:
+        print(f'draw, {move.to_uci()}')
+    else:
+        print(f'{"win" if outcome > 0 else "loss"} in {plies} plies, {move.to_uci()}')
+
+
+if __name__ == '__main__':
+    main()
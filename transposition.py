@@ -0,0 +1,171 @@
+"""
+A fixed-size transposition table that remembers the results of positions that were already searched.
+
+The entries live in two flat arrays of 64-bit integers, one for the position keys and one for the packed data,
+so the table takes exactly the memory it was given and holds no Python object per entry.
+Every bucket has two entries: the first keeps the deepest search of the bucket and the second always takes
+the newest result.
+"""
+
+from array import array
+from collections import namedtuple
+from move import Move
+
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# each entry takes a key and a data integer of 8 bytes each
+ENTRY_SIZE = 16
+BUCKET_SIZE = 2
+
+# the layout of the packed data: score, depth, bound, move and the generation of the search that stored it
+_SCORE_OFFSET = 1 << 31
+_SCORE_MASK = (1 << 32) - 1
+_DEPTH_SHIFT = 32
+_BOUND_SHIFT = 40
+_MOVE_SHIFT = 42
+_GENERATION_SHIFT = 58
+_NO_MOVE = 0xFFFF
+
+Entry = namedtuple('Entry', ['depth', 'score', 'bound', 'move'])
+
+
+class TranspositionTable:
+    """
+    The implementation of the transposition table.
+    """
+
+    def __init__(self, size_mb=16):
+        """
+        Class constructor
+        Allocates the largest power of two of buckets that fits in the given memory.
+
+        :param size_mb: the memory cap of the table, in megabytes, which can be fractional
+        """
+
+        buckets = int(size_mb * 1024 * 1024 // (ENTRY_SIZE * BUCKET_SIZE))
+        if buckets < 1:
+            raise ValueError(f'a transposition table of {size_mb} MB can\'t hold a single bucket')
+        self.buckets = 1 << (buckets.bit_length() - 1)
+        self.mask = self.buckets - 1
+        self.keys = array('Q', [0]) * (self.buckets * BUCKET_SIZE)
+        self.data = array('Q', [0]) * (self.buckets * BUCKET_SIZE)
+        self.generation = 0
+
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    @property
+    def size_mb(self):
+        """
+        The memory actually used by the entries.
+
+        :return: the size in megabytes
+        """
+
+        return self.buckets * BUCKET_SIZE * ENTRY_SIZE / (1024 * 1024)
+
+    @property
+    def hit_rate(self):
+        """
+        The share of the probes that found their position.
+
+        :return: a number between 0 and 1
+        """
+
+        return self.hits / self.probes if self.probes else 0.0
+
+    def clear(self):
+        """
+        Empties the table and resets the counters.
+
+        :return: None
+        """
+
+        self.keys = array('Q', [0]) * (self.buckets * BUCKET_SIZE)
+        self.data = array('Q', [0]) * (self.buckets * BUCKET_SIZE)
+        self.generation = 0
+        self.reset_counters()
+
+    def reset_counters(self):
+        """
+        Resets the hit rate counters.
+
+        :return: None
+        """
+
+        self.probes = self.hits = self.stores = self.overwrites = 0
+
+    def new_search(self):
+        """
+        Starts a new search, so the entries of the previous ones are replaced first.
+
+        :return: None
+        """
+
+        self.generation = (self.generation + 1) & 63
+
+    def probe(self, key):
+        """
+        Looks up a position.
+
+        :param key: the Zobrist key of the position
+        :return: an Entry, or None if the position is not in the table
+        """
+
+        self.probes += 1
+        index = (key & self.mask) * BUCKET_SIZE
+        keys = self.keys
+
+        if keys[index] == key and self.data[index]:
+            data = self.data[index]
+        elif keys[index + 1] == key and self.data[index + 1]:
+            data = self.data[index + 1]
+        else:
+            return None
+
+        self.hits += 1
+        move = data >> _MOVE_SHIFT & 0xFFFF
+        return Entry(data >> _DEPTH_SHIFT & 0xFF, (data & _SCORE_MASK) - _SCORE_OFFSET, data >> _BOUND_SHIFT & 3,
+                     None if move == _NO_MOVE else Move.from_int(move))
+
+    def store(self, key, depth, score, bound, move):
+        """
+        Stores the result of a search.
+        It goes to the depth-preferred entry of the bucket if it is at least as deep as the one there, or if that
+        one comes from an older search, and to the always-replace entry otherwise.
+
+        :param key: the Zobrist key of the position
+        :param depth: the depth the position was searched to
+        :param score: the score found
+        :param bound: EXACT, LOWER_BOUND or UPPER_BOUND
+        :param move: the best Move found, or None
+        :return: None
+        """
+
+        self.stores += 1
+        index = (key & self.mask) * BUCKET_SIZE
+        keys = self.keys
+        data = self.data
+
+        old = data[index]
+        if keys[index] == key or not old or depth >= (old >> _DEPTH_SHIFT & 0xFF) or \
+                old >> _GENERATION_SHIFT != self.generation:
+            # keeps the best move of an earlier search of the same position if this one found none
+            if move is None and keys[index] == key and old:
+                packed_move = old >> _MOVE_SHIFT & 0xFFFF
+            else:
+                packed_move = _NO_MOVE if move is None else move.to_int()
+        else:
+            index += 1
+            packed_move = _NO_MOVE if move is None else move.to_int()
+
+        if data[index] and keys[index] != key:
+            self.overwrites += 1
+
+        keys[index] = key
+        data[index] = ((score + _SCORE_OFFSET) & _SCORE_MASK | min(depth, 255) << _DEPTH_SHIFT |
+                       bound << _BOUND_SHIFT | packed_move << _MOVE_SHIFT | self.generation << _GENERATION_SHIFT)
@@ -0,0 +1,337 @@
+"""
+A server that speaks the Universal Chess Interface over the standard input and output, so the engine can be used
+by chess GUIs and tournament managers, or run headless:
+python uci.py
+
+The commands are read by an asyncio loop, while the search runs in a worker thread, so stop and isready are
+answered right away during a search. Every completed depth of the search is reported with an info line.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from board import Board, STARTING_FEN
+from engine import Engine, MATE_SCORE, MATE_BOUND, MAX_DEPTH
+from move import Move
+from tablebase import Tablebases
+from utils import WHITE
+
+ENGINE_NAME = 'python-chess'
+ENGINE_AUTHOR = 'the python-chess authors'
+
+DEFAULT_HASH_MB = 16
+MAX_HASH_MB = 1024
+
+# the time kept in reserve for the communication with the GUI, in milliseconds
+MOVE_OVERHEAD = 50
+# the number of moves the remaining time is divided between when the GUI doesn't say
+DEFAULT_MOVES_TO_GO = 30
+# the time of a search the GUI gives no limit for, in milliseconds
+DEFAULT_MOVE_TIME = 1000
+
+# the keywords of the go command, so the list of moves after searchmoves knows where it ends
+GO_KEYWORDS = ('searchmoves', 'ponder', 'wtime', 'btime', 'winc', 'binc', 'movestogo', 'depth', 'nodes', 'mate',
+               'movetime', 'infinite')
+
+
+def format_score(score):
+    """
+    Writes a score the way UCI expects it.
+
+    :param score: the score of the search, from the point of view of the side to move
+    :return: cp followed by the score in centipawns, or mate followed by the number of moves to the mate,
+     negative if the side to move is getting mated
+    """
+
+    if score > MATE_BOUND:
+        return f'mate {(MATE_SCORE - score + 1) // 2}'
+    if score < -MATE_BOUND:
+        return f'mate -{(MATE_SCORE + score) // 2}'
+
+    return f'cp {score}'
+
+
+class UCIServer:
+    """
+    The implementation of the UCI protocol.
+    """
+
+    def __init__(self, output=sys.stdout):
+        """
+        Class constructor
+
+        :param output: the text stream the responses are written to
+        """
+
+        self.output = output
+        self.output_lock = threading.Lock()
+        self.engine = Engine(None, DEFAULT_HASH_MB)
+        self.board = Board()
+
+        # the worker thread of the search, the running search and the event that stops it
+        self.executor = ThreadPoolExecutor(1)
+        self.search_task = None
+        self.stop_event = None
+
+    def send(self, line):
+        """
+        A method that writes a line to the GUI. It can be called from the search thread.
+
+        :param line: the line, without its end
+        :return: None
+        """
+
+        with self.output_lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    async def run(self, stream=sys.stdin):
+        """
+        A method that reads and handles the commands until quit is received or the input ends.
+
+        :param stream: the text stream the commands are read from
+        :return: None
+        """
+
+        loop = asyncio.get_running_loop()
+        reader = ThreadPoolExecutor(1)
+
+        while True:
+            # reading blocks, so it is done by another thread while the loop keeps running
+            line = await loop.run_in_executor(reader, stream.readline)
+            if not line:
+                break
+            if not await self.handle(line.strip()):
+                break
+
+        await self.stop()
+        reader.shutdown()
+        self.executor.shutdown()
+
+    async def handle(self, line):
+        """
+        A method that handles one command.
+
+        :param line: the command
+        :return: False if the server should quit, True otherwise
+        """
+
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, arguments = tokens[0], tokens[1:]
+
+        if command == 'uci':
+            self.send(f'id name {ENGINE_NAME}')
+            self.send(f'id author {ENGINE_AUTHOR}')
+            self.send(f'option name Hash type spin default {DEFAULT_HASH_MB} min 1 max {MAX_HASH_MB}')
+            self.send('option name TablebasePath type string default <empty>')
+            self.send('uciok')
+        elif command == 'isready':
+            self.send('readyok')
+        elif command == 'ucinewgame':
+            await self.stop()
+            self.engine.table.clear()
+            self.engine.ordering.clear()
+            self.board = Board()
+        elif command == 'setoption':
+            await self.stop()
+            self.set_option(arguments)
+        elif command == 'position':
+            await self.stop()
+            self.set_position(arguments)
+        elif command == 'go':
+            await self.stop()
+            self.go(arguments)
+        elif command == 'stop':
+            await self.stop()
+        elif command == 'quit':
+            return False
+        else:
+            self.send(f'info string unknown command {command}')
+
+        return True
+
+    def set_option(self, arguments):
+        """
+        A method that changes an option, of the form name <name> value <value>.
+
+        :param arguments: the words after setoption
+        :return: None
+        """
+
+        if 'name' not in arguments or 'value' not in arguments:
+            return
+        name = ' '.join(arguments[arguments.index('name') + 1:arguments.index('value')])
+        value = ' '.join(arguments[arguments.index('value') + 1:])
+
+        if name.lower() == 'hash':
+            try:
+                size_mb = min(max(int(value), 1), MAX_HASH_MB)
+            except ValueError:
+                self.send(f'info string invalid hash size {value}')
+                return
+            self.engine = Engine(None, size_mb, tablebases=self.engine.tablebases)
+        elif name.lower() == 'tablebasepath':
+            self.engine.tablebases = Tablebases(value) if value and value != '<empty>' else None
+        else:
+            self.send(f'info string unknown option {name}')
+
+    def set_position(self, arguments):
+        """
+        A method that sets up the position, of the form startpos or fen <FEN>, followed by moves and the moves
+        played from it.
+
+        :param arguments: the words after position
+        :return: None
+        """
+
+        moves_index = arguments.index('moves') if 'moves' in arguments else len(arguments)
+        try:
+            if arguments and arguments[0] == 'fen':
+                board = Board.from_fen(' '.join(arguments[1:moves_index]))
+            else:
+                board = Board.from_fen(STARTING_FEN)
+        except ValueError as error:
+            self.send(f'info string {error}')
+            return
+
+        for text in arguments[moves_index + 1:]:
+            try:
+                move = Move.from_uci(text)
+            except ValueError:
+                move = None
+            if move is None or not board.is_legal(move):
+                self.send(f'info string illegal move {text}')
+                break
+            board.push(move)
+
+        self.board = board
+
+    def go(self, arguments):
+        """
+        A method that starts a search in the worker thread, with the limits of the go command.
+
+        :param arguments: the words after go
+        :return: None
+        """
+
+        options = {}
+        root_moves = None
+        index = 0
+        while index < len(arguments):
+            keyword = arguments[index]
+            index += 1
+            if keyword == 'searchmoves':
+                root_moves = []
+                while index < len(arguments) and arguments[index] not in GO_KEYWORDS:
+                    try:
+                        move = Move.from_uci(arguments[index])
+                        if self.board.is_legal(move):
+                            root_moves.append(move)
+                    except ValueError:
+                        pass
+                    index += 1
+            elif keyword in ('infinite', 'ponder'):
+                options[keyword] = True
+            elif index < len(arguments):
+                try:
+                    options[keyword] = int(arguments[index])
+                except ValueError:
+                    pass
+                index += 1
+
+        self.stop_event = threading.Event()
+        self.search_task = asyncio.create_task(self.search(options, root_moves or None))
+
+    def allocate_time(self, options):
+        """
+        A method that decides how long the search can take.
+
+        :param options: the limits of the go command
+        :return: the time budget in milliseconds, or None if there is none
+        """
+
+        if 'movetime' in options:
+            return max(options['movetime'] - MOVE_OVERHEAD, 1)
+
+        white = self.board.turn == WHITE
+        remaining = options.get('wtime' if white else 'btime')
+        if remaining is None:
+            return None
+
+        increment = options.get('winc' if white else 'binc', 0)
+        moves_to_go = options.get('movestogo') or DEFAULT_MOVES_TO_GO
+        budget = remaining // moves_to_go + increment * 3 // 4
+
+        # never uses more than half of the remaining time
+        return max(min(budget, remaining // 2) - MOVE_OVERHEAD, 1)
+
+    async def search(self, options, root_moves):
+        """
+        A coroutine that runs a search in the worker thread and sends its best move.
+        An infinite search only sends it once it is stopped, as the protocol requires, while a search without any
+        limit is given DEFAULT_MOVE_TIME.
+
+        :param options: the limits of the go command
+        :param root_moves: a list of the root Moves to search, or None to search all of them
+        :return: None
+        """
+
+        board = self.board.copy()
+        stop_event = self.stop_event
+        infinite = options.get('infinite', False) or options.get('ponder', False)
+        depth = options.get('depth') or (MAX_DEPTH if infinite else None)
+        time_limit = None if infinite else self.allocate_time(options)
+        node_limit = options.get('nodes')
+        if not infinite and depth is None and time_limit is None and node_limit is None:
+            time_limit = DEFAULT_MOVE_TIME
+        start = time.perf_counter()
+
+        def report(current_depth, move, score):
+            elapsed = time.perf_counter() - start
+            nodes = self.engine.nodes
+            line = ' '.join(move.to_uci() for move in self.engine.principal_variation(board, move, current_depth))
+            self.send(f'info depth {current_depth} score {format_score(score)} nodes {nodes} '
+                      f'nps {int(nodes / max(elapsed, 1e-6))} time {int(elapsed * 1000)} pv {line}')
+
+        loop = asyncio.get_running_loop()
+        move, score = await loop.run_in_executor(self.executor, self.engine.search, board, depth, time_limit,
+                                                 node_limit, stop_event, root_moves, report)
+
+        if infinite:
+            await loop.run_in_executor(None, stop_event.wait)
+
+        # a search stopped before its first depth still has to answer with a legal move
+        if move is None:
+            moves = root_moves or board.legal_moves()
+            move = moves[0] if moves else None
+        self.send(f'bestmove {move.to_uci() if move is not None else "0000"}')
+
+    async def stop(self):
+        """
+        A coroutine that stops the running search, if there is one, and waits until it sent its best move.
+
+        :return: None
+        """
+
+        if self.search_task is not None:
+            self.stop_event.set()
+            await self.search_task
+            self.search_task = None
+
+
+def main():
+    """
+    Runs the server until quit is received or the input ends.
+
+    :return: None
+    """
+
+    asyncio.run(UCIServer().run())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,35 @@
 BLACK = 0
 WHITE = 1
 
+PAWN = 0
+KNIGHT = 1
+BISHOP = 2
+ROOK = 3
+QUEEN = 4
+KING = 5
+
+# the letters of the piece types, in uppercase for white and lowercase for black
+PIECE_SYMBOLS = 'pnbrqk'
+
+WHITE_KINGSIDE = 1
+WHITE_QUEENSIDE = 2
+BLACK_KINGSIDE = 4
+BLACK_QUEENSIDE = 8
+ALL_CASTLING_RIGHTS = WHITE_KINGSIDE | WHITE_QUEENSIDE | BLACK_KINGSIDE | BLACK_QUEENSIDE
+
+# the castling rights that are lost when a piece moves from or to one of these squares
+CASTLING_SQUARES = {
+    (4, 0): WHITE_KINGSIDE | WHITE_QUEENSIDE,
+    (7, 0): WHITE_KINGSIDE,
+    (0, 0): WHITE_QUEENSIDE,
+    (4, 7): BLACK_KINGSIDE | BLACK_QUEENSIDE,
+    (7, 7): BLACK_KINGSIDE,
+    (0, 7): BLACK_QUEENSIDE,
+}
+
 BLACK_COLOR = (50, 50, 50)
 WHITE_COLOR = (255, 255, 255)
+SELECTED_COLOR = (120, 170, 90)
 
 WIDTH = 480
 HEIGHT = 480
@@ -11,3 +38,50 @@ ROWS = 8
 COLUMNS = 8
 
 SQUARE_SIZE = WIDTH//COLUMNS
+
+
+def square_index(position):
+    """
+    Converts a board position to a square index, numbered row by row from a1 to h8.
+
+    :param position: a tuple consisting of the column and row
+    :return: the index of the square
+    """
+
+    return position[1] * 8 + position[0]
+
+
+def square_position(square):
+    """
+    Converts a square index to a board position.
+
+    :param square: the index of the square
+    :return: a tuple consisting of the column and row
+    """
+
+    return square & 7, square >> 3
+
+
+def square_name(position):
+    """
+    Converts a board position to its algebraic name.
+
+    :param position: a tuple consisting of the column and row
+    :return: the name of the square, such as e4
+    """
+
+    return 'abcdefgh'[position[0]] + str(position[1] + 1)
+
+
+def parse_square(name):
+    """
+    Converts the algebraic name of a square to a board position.
+
+    :param name: the name of the square, such as e4
+    :return: a tuple consisting of the column and row
+    """
+
+    if len(name) != 2 or name[0] not in 'abcdefgh' or name[1] not in '12345678':
+        raise ValueError(f'Invalid square: {name}')
+
+    return 'abcdefgh'.index(name[0]), int(name[1]) - 1
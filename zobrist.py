@@ -0,0 +1,44 @@
+"""
+Zobrist hashing of chess positions.
+
+Every piece on every square, the side to move, every combination of castling rights and every en passant
+column get a random 64-bit key. The key of a position is the XOR of the keys of its features, so a move
+only has to XOR in and out the few features it changes.
+"""
+
+import random
+from utils import *
+
+# a fixed seed keeps the keys identical between runs and processes, so stored hashes stay valid
+_generator = random.Random(0x5EED)
+
+# PIECE_KEYS[color][piece_type][square]
+PIECE_KEYS = tuple(tuple(tuple(_generator.getrandbits(64) for square in range(64)) for piece_type in range(6))
+                   for color in range(2))
+BLACK_TO_MOVE_KEY = _generator.getrandbits(64)
+CASTLING_KEYS = tuple(_generator.getrandbits(64) for rights in range(16))
+EN_PASSANT_KEYS = tuple(_generator.getrandbits(64) for column in range(8))
+
+
+def compute_hash(board):
+    """
+    Computes the key of a position from scratch by scanning the whole board.
+    It is only needed once per board, the board updates its key incrementally afterwards.
+
+    :param board: the board
+    :return: the 64-bit key of the position
+    """
+
+    key = 0
+    for row in board.pieces:
+        for piece in row:
+            if piece is not None:
+                key ^= PIECE_KEYS[piece.color][piece.piece_type][square_index(piece.position)]
+
+    if board.turn == BLACK:
+        key ^= BLACK_TO_MOVE_KEY
+    key ^= CASTLING_KEYS[board.castling_rights]
+    if board.en_passant is not None:
+        key ^= EN_PASSANT_KEYS[board.en_passant[0]]
+
+    return key